@@ -1,4 +1,5 @@
 import streamlit as st
+import asyncio
 import time
 import base64
 import os
@@ -10,10 +11,18 @@ try:
 except ImportError:
     pass
 
-from llm_prompt import ClaudeAI, DEFAULT_MODEL_NAMES
-from tor_search import SEARCH_ENGINES, fetch_search_results, get_search_results
-from catching import scrape_single
+from llm_prompt import (
+    ANALYSIS_SITES, BRIEF_EARLY_AT, BRIEF_SITES, DEFAULT_MODEL_NAMES, MAP_REDUCE, MAP_SITE_CHARS,
+    ClaudeAI, SiteMapper, stream_in_background,
+)
+from tor_search import ENGINE_HEALTH, SEARCH_CACHE, SEARCH_ENGINES, async_collect_search_results, rank_search_results
+from catching import get_parse_pool, scrape_stream
 from timeline import uptime_bar_html
+from tor_control import tor_metrics, wait_for_tor
+from tor_pool import pool_stats, port_stats
+from monitor import SiteMonitor, scrape_checks
+from page_cache import get_page_cache
+from llm_cache import get_llm_cache
 import ui
 
 st.set_page_config(
@@ -41,6 +50,52 @@ if "smart_online_only" not in st.session_state: st.session_state.smart_online_on
 
 claude_ai = st.session_state.claude_ai
 
+
+@st.cache_resource
+def get_site_monitor() -> SiteMonitor:
+    # one scheduler per server process, shared by every session and rerun
+    monitor = SiteMonitor()
+    monitor.start()
+    return monitor
+
+
+site_monitor = get_site_monitor()
+
+
+def uptime_pct(site: dict) -> float:
+    # 7-day figure from the monitor's rollups; sites it hasn't checked yet fall back to this hunt's result
+    pct = site_monitor.uptime(site["url"])["uptime_pct"]
+    if pct is None:
+        return 100 if site["status"] == "online" else 0
+    return pct
+
+
+def site_timeline_html(site: dict) -> str:
+    url = site["url"]
+    return uptime_bar_html(
+        site,
+        history=lambda: site_monitor.get_buckets(url),
+        version=site_monitor.history_version(url),
+    )
+
+
+def map_stage(query: str, sites: list, cap: int):
+    """
+    Map-reduce notes for lists past a prompt's cap, with a progress bar while
+    the batches run, so the *_stream call that follows starts writing at once.
+    None when the sites fit in one prompt.
+    """
+    if not MAP_REDUCE or len(sites) <= cap:
+        return None
+    bar = st.progress(0.0, text=f"Reading {len(sites)} sites in batches...")
+
+    def on_progress(done, total):
+        bar.progress(done / total, text=f"Reading {len(sites)} sites in batches — {done}/{total} done")
+
+    notes = claude_ai.map_notes(query, sites, cap, on_progress)
+    bar.empty()
+    return notes
+
 with st.sidebar:
     last_query = ""
     requested_count = 0
@@ -64,10 +119,12 @@ with st.sidebar:
         offline_count, 
         st.session_state.selected_model,
         st.session_state.claude_ai,
-        DEFAULT_MODEL_NAMES
+        DEFAULT_MODEL_NAMES,
+        ENGINE_HEALTH.snapshot(),
     )
     
     if sidebar_result == "clear":
+        site_monitor.untrack_found()
         st.session_state.discovered_sites = []
         st.session_state.offline_sites    = []
         st.session_state.hunt_result      = None
@@ -89,8 +146,6 @@ with tab1:
         if not search_query.strip():
             st.warning("Enter a search query to begin hunting.")
         else:
-            from concurrent.futures import ThreadPoolExecutor, as_completed
-
             q_safe      = ui.clean(search_query, 80)
             total_eng   = len(SEARCH_ENGINES)
             prog        = st.progress(0)
@@ -102,52 +157,62 @@ with tab1:
             term.markdown(ui.render_terminal(log_lines, "[ 1 / 3 ]  SEARCHING ENGINES"), unsafe_allow_html=True)
             prog.progress(2)
 
-            raw_results  = []
-            done_count   = 0
+            # a fresh container starts Tor alongside the app — don't hunt before it has circuits
+            bootstrap_line = []   # index of the status line once shown
 
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                future_map = {
-                    executor.submit(fetch_search_results, eng, search_query): eng
-                    for eng in SEARCH_ENGINES
-                }
-                for future in as_completed(future_map):
-                    eng        = future_map[future]
-                    done_count += 1
-                    pct        = int(2 + (done_count / total_eng) * 28)
-                    try:
-                        results = future.result()
-                        count   = len(results)
-                        raw_results.extend(results)
-                        if count > 0:
-                            color = "#e63946"
-                            icon  = "●"
-                            msg   = f"{count} links"
-                        else:
-                            color = "#5a5e6a"
-                            icon  = "○"
-                            msg   = "no results"
-                    except Exception as e:
-                        color = "#f0a500"
-                        icon  = "✕"
-                        msg   = f"error: {str(e)[:40]}"
+            def on_bootstrap(progress, summary):
+                line = f'<span style="color:#f0a500;">TOR BOOTSTRAP {progress}% — {ui.clean(summary, 40)}</span>'
+                if not bootstrap_line:
+                    bootstrap_line.append(len(log_lines))
+                    log_lines.append(line)
+                else:
+                    log_lines[bootstrap_line[0]] = line
+                term.markdown(ui.render_terminal(log_lines, "[ 0 / 3 ]  WAITING FOR TOR"), unsafe_allow_html=True)
 
-                    eng_name = ui.clean(eng["name"], 22)
-                    log_lines.append(
-                        f'<span style="color:{color};">{icon}</span>'
-                        f' <span style="color:#8a9ab0;">{eng_name:<22}</span>'
-                        f' <span style="color:{color};">{msg}</span>'
-                        f' <span style="color:#2a2e38;">({done_count}/{total_eng})</span>'
-                    )
-                    term.markdown(ui.render_terminal(log_lines, "[ 1 / 3 ]  SEARCHING ENGINES"), unsafe_allow_html=True)
-                    prog.progress(pct)
+            if wait_for_tor(on_progress=on_bootstrap) is False:
+                st.error("Tor is still bootstrapping. Try the hunt again in a minute.")
+                st.stop()
+
+            done_count   = [0]
+
+            def on_engine_done(eng, results, error):
+                done_count[0] += 1
+                pct = int(2 + (done_count[0] / total_eng) * 28)
+                if error is not None:
+                    color = "#f0a500"
+                    icon  = "✕"
+                    msg   = f"error: {str(error)[:40]}"
+                elif results:
+                    color = "#e63946"
+                    icon  = "●"
+                    msg   = f"{len(results)} links"
+                else:
+                    color = "#5a5e6a"
+                    icon  = "○"
+                    msg   = "no results"
+
+                eng_name = ui.clean(eng["name"], 22)
+                log_lines.append(
+                    f'<span style="color:{color};">{icon}</span>'
+                    f' <span style="color:#8a9ab0;">{eng_name:<22}</span>'
+                    f' <span style="color:{color};">{msg}</span>'
+                    f' <span style="color:#2a2e38;">({done_count[0]}/{total_eng})</span>'
+                )
+                term.markdown(ui.render_terminal(log_lines, "[ 1 / 3 ]  SEARCHING ENGINES"), unsafe_allow_html=True)
+                prog.progress(pct)
+
+            # engines run as coroutines, one SOCKS transport each; a hung engine is cancelled at its deadline
+            raw_results = asyncio.run(
+                async_collect_search_results(search_query, on_engine_done=on_engine_done)
+            )
 
             log_lines.append("")
             log_lines.append(f'<span style="color:#5a5e6a;">RANKING {len(raw_results)} results with BM25...</span>')
             term.markdown(ui.render_terminal(log_lines, "[ 2 / 3 ]  RANKING & SMART SCRAPING"), unsafe_allow_html=True)
             prog.progress(30)
 
-            # Get ranked unique results
-            ranked_results = get_search_results(search_query, max_workers=10)
+            # Rank the results already collected above — no second engine pass
+            ranked_results = rank_search_results(search_query, raw_results)
             
             log_lines.append(
                 f'<span style="color:#00c97a;">RANKED: {len(ranked_results)} unique sites by relevance</span>'
@@ -164,92 +229,96 @@ with tab1:
 
             active_sites = []
             offline_sites = []
-            scraped_count = 0
             checked_count = 0
             
             scrape_limit = min(len(ranked_results), max_results * 3)
-            
-            batch_size = 10
-            
-            for batch_start in range(0, scrape_limit, batch_size):
-                # Check if we already have enough online sites
-                if len(active_sites) >= max_results:
+
+            # the brief only reads the first BRIEF_SITES online sites, so it can start while scraping goes on.
+            # once a hunt goes past that, the sites after the early brief's are map-reduced, each batch
+            # summarised as soon as it fills, and the early brief becomes the first part of the reduce.
+            # ROTTWEILER_BRIEF_EARLY_AT=0 turns the early brief off
+            early_brief = None
+            early_at = max(0, min(BRIEF_EARLY_AT, BRIEF_SITES, max_results))
+            mapper = None
+
+            # Continuous scheduler: 5 fetches in flight, next URL in BM25 order as soon as one lands
+            for item, url_key, data in scrape_stream(
+                ranked_results[:scrape_limit], max_workers=5, max_online=max_results,
+                parse_pool=get_parse_pool(),
+            ):
+                checked_count += 1
+                pct = min(77, int(37 + (checked_count / scrape_limit) * 40))
+
+                ts = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+                status_val = data.get("status", "offline")
+                title = data.get("title") or item.get("title") or url_key
+
+                site_record = {
+                    "url":           url_key,
+                    "title":         title,
+                    "title_safe":    ui.clean(title, 100),
+                    "content":       data.get("content", ""),
+                    "status":        status_val,
+                    "status_code":   data.get("status_code"),
+                    "response_time": data.get("fetch_ms", 0),
+                    "ttfb_ms":       data.get("ttfb_ms", 0),
+                    "bytes":         data.get("bytes", 0),
+                    "discovered_at": ts,
+                    "query":         search_query,
+                    "tags":          [search_query],
+                    "description":   title,
+                    "bm25_score":    item.get("bm25_score", 0),
+                }
+
+                if status_val == "online":
+                    active_sites.append(site_record)
+                    st_icon = "●"
+                    st_color = "#e63946"
+                    status_msg = f"ONLINE ({len(active_sites)}/{max_results})"
+                    if mapper is not None:
+                        mapper.add(site_record)
+                    elif early_at and early_brief is None and claude_ai and len(active_sites) >= early_at:
+                        early_brief = stream_in_background(
+                            claude_ai.summarize_results_stream(search_query, active_sites[:early_at])
+                        )
+                    elif (early_brief is not None or not early_at) and claude_ai and MAP_REDUCE \
+                            and len(active_sites) > BRIEF_SITES:
+                        mapper = SiteMapper(claude_ai, search_query)
+                        for site in active_sites[early_at:]:
+                            mapper.add(site)
+                else:
+                    offline_sites.append(site_record)
+                    st_icon = "○"
+                    st_color = "#5a5e6a"
+                    status_msg = "offline"
+
+                short_url = url_key[7:47] + "…" if len(url_key) > 50 else url_key[7:]
+                short_url_safe = ui.clean(short_url, 50)
+
+                log_lines.append(
+                    f'<span style="color:{st_color};">{st_icon}</span>'
+                    f' <span style="color:#8a9ab0;font-size:11px;">{short_url_safe}</span>'
+                    f' <span style="color:{st_color};font-size:10px;">{status_msg}</span>'
+                )
+                if early_brief is not None and status_val == "online" and len(active_sites) == early_at:
                     log_lines.append(
-                        f'<span style="color:#00c97a;">✓ TARGET REACHED: {len(active_sites)} online sites found</span>'
+                        f'<span style="color:#5a5e6a;">AI BRIEF STARTED on first {early_at} online sites</span>'
                     )
-                    break
-                
-                batch_end = min(batch_start + batch_size, scrape_limit)
-                batch = ranked_results[batch_start:batch_end]
-                
-                # Scrape this batch
-                with ThreadPoolExecutor(max_workers=5) as executor:
-                    future_map = {
-                        executor.submit(scrape_single, item): item
-                        for item in batch
-                    }
-                    
-                    for future in as_completed(future_map):
-                        if len(active_sites) >= max_results:
-                            break
-                            
-                        checked_count += 1
-                        pct = min(77, int(37 + (checked_count / scrape_limit) * 40))
-                        
-                        try:
-                            url_key, data = future.result()
-                            item = future_map[future]
-                            
-                            ts = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
-                            status_val = data.get("status", "offline")
-                            title = data.get("title") or item.get("title") or url_key
-                            
-                            site_record = {
-                                "url":           url_key,
-                                "title":         title,
-                                "title_safe":    ui.clean(title, 100),
-                                "content":       data.get("content", ""),
-                                "status":        status_val,
-                                "status_code":   data.get("status_code"),
-                                "response_time": 0,
-                                "discovered_at": ts,
-                                "query":         search_query,
-                                "tags":          [search_query],
-                                "description":   title,
-                                "bm25_score":    item.get("bm25_score", 0),
-                            }
-                            
-                            if status_val == "online":
-                                active_sites.append(site_record)
-                                st_icon = "●"
-                                st_color = "#e63946"
-                                status_msg = f"ONLINE ({len(active_sites)}/{max_results})"
-                            else:
-                                offline_sites.append(site_record)
-                                st_icon = "○"
-                                st_color = "#5a5e6a"
-                                status_msg = "offline"
-                            
-                            short_url = url_key[7:47] + "…" if len(url_key) > 50 else url_key[7:]
-                            short_url_safe = ui.clean(short_url, 50)
-                            
-                            log_lines.append(
-                                f'<span style="color:{st_color};">{st_icon}</span>'
-                                f' <span style="color:#8a9ab0;font-size:11px;">{short_url_safe}</span>'
-                                f' <span style="color:{st_color};font-size:10px;">{status_msg}</span>'
-                            )
-                        except Exception:
-                            checked_count += 1
-                        
-                        term.markdown(
-                            ui.render_terminal(
-                                log_lines, 
-                                f"[ 2 / 3 ]  SMART SCRAPING  ({len(active_sites)}/{max_results} online)"
-                            ), 
-                            unsafe_allow_html=True
-                        )
-                        prog.progress(pct)
-            
+
+                term.markdown(
+                    ui.render_terminal(
+                        log_lines,
+                        f"[ 2 / 3 ]  SMART SCRAPING  ({len(active_sites)}/{max_results} online)"
+                    ),
+                    unsafe_allow_html=True
+                )
+                prog.progress(pct)
+
+            if len(active_sites) >= max_results:
+                log_lines.append(
+                    f'<span style="color:#00c97a;">✓ TARGET REACHED: {len(active_sites)} online sites found</span>'
+                )
+
             # Final scraping summary
             log_lines.append("")
             log_lines.append(
@@ -266,12 +335,53 @@ with tab1:
             prog.progress(88)
 
             summary = ""
-            sites_for_ai = active_sites[:20] if active_sites else []
+            notes = None
+            if early_brief is not None and mapper is None and len(active_sites) > early_at:
+                # the hunt ended with sites the early brief never saw, but no more than the brief reads
+                if MAP_REDUCE:
+                    mapper = SiteMapper(claude_ai, search_query)
+                    for site in active_sites[early_at:BRIEF_SITES]:
+                        mapper.add(site)
+                else:
+                    early_brief = None
+            if mapper is not None:
+                merge_line = len(log_lines)
+                log_lines.append("")
+
+                def on_batch(done, total):
+                    log_lines[merge_line] = (
+                        f'<span style="color:#5a5e6a;">READING {mapper.sites} MORE SITES IN BATCHES — '
+                        f'{done}/{total} done</span>'
+                    )
+                    term.markdown(ui.render_terminal(log_lines, "[ 3 / 3 ]  AI ANALYSIS"), unsafe_allow_html=True)
+
+                on_batch(0, mapper.batches())
+                # the early brief had the rest of the scrape to finish; it leads the reduce
+                lead = ""
+                if early_brief is not None:
+                    try:
+                        lead = "".join(early_brief)
+                    except Exception as e:
+                        print(f"[HUNT] early brief failed: {e}")
+                notes = mapper.notes(on_batch, lead=lead, lead_sites=early_at if lead else 0)
+                early_brief = None if notes or not lead else iter([lead])
+            sites_for_ai = active_sites if notes else active_sites[:BRIEF_SITES]
             if sites_for_ai and claude_ai:
+                # the brief streams into the terminal as the model writes it
+                brief_line = len(log_lines)
+                log_lines.append("")
+
+                def show_brief(text):
+                    log_lines[brief_line] = ui.brief_preview_html(text)
+                    return ui.render_terminal(log_lines, "[ 3 / 3 ]  AI ANALYSIS")
+
+                # an early brief has been writing since scraping hit early_at; what it has so far shows at once
+                chunks = early_brief or claude_ai.summarize_results_stream(search_query, sites_for_ai, notes=notes)
                 try:
-                    summary = claude_ai.summarize_results(search_query, sites_for_ai)
+                    summary = ui.render_streaming(chunks, show_brief, term)
                 except Exception as e:
                     summary = f"[AI summary error: {e}]"
+                log_lines[brief_line] = ""
 
             log_lines.append(
                 f'<span style="color:#00c97a;">HUNT COMPLETE — '
@@ -282,6 +392,8 @@ with tab1:
             
         
             active_sites = active_sites[:max_results]
+            site_monitor.add_found(active_sites)
+            site_monitor.record_results(scrape_checks(active_sites))
             
             st.session_state.discovered_sites = active_sites
             st.session_state.offline_sites = offline_sites
@@ -313,18 +425,21 @@ with tab1:
             site_data  = [
                 {
                     "url": s["url"], "status": s["status"],
-                    "uptime_pct": 100 if s["status"] == "online" else 0,
+                    "uptime_pct": uptime_pct(s),
                     "tags": [s.get("query","")],
                     "title": s.get("title_safe", s.get("title","")),
-                    "content": s.get("content","")[:300],
+                    "content": s.get("content","")[:MAP_SITE_CHARS],
                 }
-                for s in sites[:30]
+                for s in sites
             ]
-            with st.spinner("Generating intelligence brief..."):
-                brief = claude_ai.summarize_results(last_query, site_data)
+            notes = map_stage(last_query, site_data, BRIEF_SITES)
+            chunks = claude_ai.summarize_results_stream(last_query, site_data, notes=notes)
+            streaming = st.empty()
+            brief = ui.render_streaming(chunks, ui.analysis_box_html, streaming)
+            streaming.empty()   # render_hunt_results shows the finished brief
             st.session_state.intel_brief = brief
         
-        ui.render_hunt_results(result, sites, offline_sites, uptime_bar_html)
+        ui.render_hunt_results(result, sites, offline_sites, site_timeline_html)
         
         if brief:
             last_query = sites[0].get("query", "hunt") if sites else "hunt"
@@ -346,52 +461,57 @@ with tab2:
         generate_brief, custom_prompt, run_analysis = ui.render_analysis_tab_content(sites)
         
         if generate_brief:
-            with st.spinner("Analyzing with AI..."):
-                last_query = sites[0].get("query", "dark web") if sites else "dark web"
-                site_data  = [
+            last_query = sites[0].get("query", "dark web") if sites else "dark web"
+            site_data  = [
+                {
+                    "url": s["url"], "status": s["status"],
+                    "uptime_pct": uptime_pct(s),
+                    "tags": [s.get("query","")],
+                    "title": s.get("title_safe", ""),
+                    "content": s.get("content","")[:MAP_SITE_CHARS],
+                }
+                for s in sites
+            ]
+            notes = map_stage(last_query, site_data, BRIEF_SITES)
+            brief = ui.render_analysis_result(claude_ai.summarize_results_stream(last_query, site_data, notes=notes))
+            st.session_state.intel_brief = brief
+            st.download_button(
+                label="Download Intelligence Report (.md)",
+                data=brief,
+                file_name=f"rottweiler_{last_query}_analysis.md",
+                mime="text/markdown"
+            )
+
+        if run_analysis:
+            if custom_prompt.strip():
+                site_data = [
                     {
                         "url": s["url"], "status": s["status"],
-                        "uptime_pct": 100 if s["status"] == "online" else 0,
-                        "tags": [s.get("query","")],
-                        "title": s.get("title_safe", ""),
-                        "content": s.get("content","")[:300],
+                        "uptime_pct": uptime_pct(s),
+                        "tags": [s.get("query","")], "check_count": 1,
+                        "title": s.get("title_safe",""),
+                        "content": s.get("content","")[:MAP_SITE_CHARS],
                     }
-                    for s in sites[:30]
+                    for s in sites
                 ]
-                brief = claude_ai.summarize_results(last_query, site_data)
-                st.session_state.intel_brief = brief
-                ui.render_analysis_result(brief)
+                notes = map_stage(custom_prompt, site_data, ANALYSIS_SITES)
+                result_text = ui.render_custom_analysis_result(
+                    claude_ai.analyze_sites_stream(custom_prompt, site_data, notes=notes)
+                )
+            
                 st.download_button(
-                    label="Download Intelligence Report (.md)",
-                    data=brief,
-                    file_name=f"rottweiler_{last_query}_analysis.md",
+                    label="Download Analysis Report (.md)",
+                    data=result_text,
+                    file_name=f"rottweiler_custom_analysis.md",
                     mime="text/markdown"
                 )
-
-        if run_analysis:
-            if custom_prompt.strip():
-                with st.spinner("Analyzing..."):
-                    site_data = [
-                        {
-                            "url": s["url"], "status": s["status"],
-                            "uptime_pct": 100 if s["status"] == "online" else 0,
-                            "tags": [s.get("query","")], "check_count": 1,
-                            "title": s.get("title_safe",""),
-                            "content": s.get("content","")[:400],
-                        }
-                        for s in sites[:50]
-                    ]
-                    result_text = claude_ai.analyze_sites(custom_prompt, site_data)
-                    ui.render_custom_analysis_result(result_text)
-                
-                    st.download_button(
-                        label="Download Analysis Report (.md)",
-                        data=result_text,
-                        file_name=f"rottweiler_custom_analysis.md",
-                        mime="text/markdown"
-                    )
             else:
                 st.warning("Enter a prompt first.")
 
 with tab3:
-    ui.render_settings_tab()
+    cache_stats = {"search": SEARCH_CACHE.summary()}
+    if get_page_cache():
+        cache_stats["pages"] = get_page_cache().summary()
+    if get_llm_cache():
+        cache_stats["llm"] = get_llm_cache().summary()
+    ui.render_settings_tab(pool_stats(), cache_stats, port_stats(), tor_metrics())
@@ -0,0 +1,71 @@
+"""
+Per-page parse time: BeautifulSoup/html.parser vs the lxml fast path.
+
+    python bench_extract.py [--pages 200] [--size-kb 64 256 1024]
+
+Pages are synthetic onion-style dumps (nav, scripts, styles, long tables of
+listings) so no Tor connection is needed.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from catching import MAX_CONTENT_CHARS
+from extract import EXTRACTORS
+
+_WORDS = ("market vendor escrow bitcoin monero pgp listing forum leak dump "
+          "ransomware access database carding exploit shop review").split()
+
+
+def _sentence(rng: random.Random, n: int = 12) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n))
+
+
+def make_page(size_kb: int, seed: int = 0) -> str:
+    rng   = random.Random(seed)
+    parts = [
+        "<html><head><title>Onion Market &amp; Forum</title>",
+        "<style>" + "body{color:#000}" * 200 + "</style>",
+        "<script>" + "var x=1;" * 500 + "</script></head><body>",
+        "<nav>" + "".join(f'<a href="/c/{i}">{_sentence(rng, 2)}</a>' for i in range(60)) + "</nav>",
+        "<header><h1>Welcome</h1></header><table>",
+    ]
+    size = sum(len(p) for p in parts)
+    i = 0
+    while size < size_kb * 1024:
+        row = (f'<tr><td><a href="http://{"a" * 56}.onion/item/{i}">{_sentence(rng, 4)}</a></td>'
+               f"<td>{_sentence(rng)}</td><!-- row {i} --><td><button>buy</button></td></tr>")
+        parts.append(row)
+        size += len(row)
+        i += 1
+    parts.append("</table><footer>contact: admin</footer></body></html>")
+    return "".join(parts)
+
+
+def bench(pages: int, size_kb: int):
+    docs = [make_page(size_kb, seed) for seed in range(pages)]
+    print(f"\n{pages} pages × {size_kb} KiB")
+    print(f"{'extractor':<10} {'page() ms':>10} {'links() ms':>11}")
+
+    for name, extractor in EXTRACTORS.items():
+        page_ms, link_ms = [], []
+        for doc in docs:
+            t0 = time.perf_counter()
+            extractor.page(doc, max_chars=MAX_CONTENT_CHARS + 1)
+            t1 = time.perf_counter()
+            extractor.links(doc)
+            t2 = time.perf_counter()
+            page_ms.append((t1 - t0) * 1000)
+            link_ms.append((t2 - t1) * 1000)
+        print(f"{name:<10} {statistics.median(page_ms):>10.2f} {statistics.median(link_ms):>11.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--size-kb", type=int, nargs="+", default=[64, 256, 1024])
+    args = parser.parse_args()
+
+    for kb in args.size_kb:
+        bench(args.pages, kb)
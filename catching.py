@@ -1,19 +1,32 @@
 
+import os
 import re
+import queue
+import time
 import random
+import threading
 import warnings
+import multiprocessing
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from extract import get_extractor
+from page_cache import get_page_cache
+from tor_search import _normalise
+from tor_control import report_scrape
+from tor_pool import TorSessionPool, isolation_key
 
 warnings.filterwarnings("ignore")
 
 
-MAX_CONTENT_CHARS = 2500   # max chars 
-SCRAPE_TIMEOUT    = 45     # seconds 
+MAX_CONTENT_CHARS  = 2500         # max chars 
+SCRAPE_TIMEOUT     = 45           # seconds 
+MAX_DOWNLOAD_BYTES = 256 * 1024   # body budget per page
+CHUNK_BYTES        = 16 * 1024
+PARSE_INLINE_BYTES = 32 * 1024    # smaller pages are parsed in the fetch loop, not shipped to a process
+
+_HTML_TYPES = ("text/html", "application/xhtml+xml", "text/plain", "")
 
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36",
@@ -23,102 +36,293 @@ USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 14.7; rv:137.0) Gecko/20100101 Firefox/137.0",
 ]
 
-def get_tor_session() -> requests.Session:
-    session = requests.Session()
-    retry = Retry(
-        total=2,
-        read=2,
-        connect=2,
-        backoff_factor=0.3,
-        status_forcelist=[500, 502, 503, 504],
-    )
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount("http://",  adapter)
-    session.mount("https://", adapter)
-    session.proxies = {
-        "http":  "socks5h://127.0.0.1:9050",
-        "https": "socks5h://127.0.0.1:9050",
+_POOL = TorSessionPool("scrape", retries=2, backoff_factor=0.3)
+
+
+def get_tor_session(isolate: Optional[str] = None) -> requests.Session:
+    return _POOL.session(isolate)
+
+
+def _read_capped(response: requests.Response, max_bytes: int) -> Tuple[str, int]:
+    """Read at most max_bytes of the body, then drop the connection instead of draining it. Returns (text, bytes read)."""
+    buf = bytearray()
+    truncated = False
+    for chunk in response.iter_content(chunk_size=CHUNK_BYTES):
+        buf.extend(chunk)
+        if len(buf) >= max_bytes:
+            truncated = True
+            break
+
+    if truncated:
+        response.close()
+    encoding = response.encoding or "utf-8"
+    return bytes(buf[:max_bytes]).decode(encoding, errors="replace"), len(buf)
+
+
+def parse_page(html: str, title: str) -> Tuple[str, str]:
+    """CPU stage: raw HTML -> (title, clean text). Top-level so a process pool can run it."""
+    raw_title, text = get_extractor().page(html, max_chars=MAX_CONTENT_CHARS + 1)
+    if raw_title:
+        raw_title = re.sub(r"<[^>]+>", "", raw_title)
+        raw_title = raw_title.replace("&lt;", "").replace("&gt;", "").replace("&amp;", "&")
+        title = raw_title.strip() or title
+
+    if len(text) > MAX_CONTENT_CHARS:
+        text = text[:MAX_CONTENT_CHARS] + "...[truncated]"
+    return title, text
+
+
+def _from_cache(cached: Dict, title: str) -> Dict:
+    return {
+        "title":       cached["title"] or title,
+        "content":     cached["content"],
+        "status":      cached["status"],
+        "status_code": cached["status_code"],
+        "cached":      True,
     }
-    return session
 
 
-def scrape_single(url_data: Dict) -> tuple:
+def _remember(url: str, data: Dict):
+    """Store freshly scraped online pages; cache hits and failures are left alone."""
+    cache = get_page_cache()
+    if cache and data.get("status") == "online" and data.get("status_code") == 200 and not data.get("cached"):
+        try:
+            cache.put(_normalise(url), data)
+        except Exception as e:
+            print(f"[CACHE] store failed for {url[:50]}: {str(e)[:80]}")
+
+
+def _ms(since: float) -> int:
+    return int((time.monotonic() - since) * 1000)
+
+
+def fetch_raw(url_data: Dict, max_bytes: int = MAX_DOWNLOAD_BYTES) -> Tuple[str, Dict, Optional[str]]:
+    """
+    I/O stage: returns (url, data, html). html is None when there is nothing to
+    parse, in which case data is already final.
+
+    Every request that went out is timed: ttfb_ms (headers in), fetch_ms
+    (body read or connection given up) and bytes (body bytes received).
+    Fresh cache hits never touch the network and carry no timings.
+    """
     url   = url_data.get("link", "")
     title = url_data.get("title", url)
 
     headers = {"User-Agent": random.choice(USER_AGENTS)}
 
-    try:
-        session  = get_tor_session()
-        response = session.get(url, headers=headers, timeout=SCRAPE_TIMEOUT)
-        code     = response.status_code
+    cache  = get_page_cache()
+    key    = _normalise(url)
+    cached = cache.get(key) if cache else None
+    if cached:
+        if cached["fresh"]:
+            cache.hit()
+            return url, _from_cache(cached, title), None
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
 
-        if code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
+    start = time.monotonic()
+    timing = {"ttfb_ms": 0, "fetch_ms": 0, "bytes": 0}
 
-            title_tag = soup.find("title")
-            if title_tag and title_tag.get_text(strip=True):
-                raw_title = title_tag.get_text(strip=True)
-                raw_title = re.sub(r"<[^>]+>", "", raw_title)
-                raw_title = raw_title.replace("&lt;", "").replace("&gt;", "").replace("&amp;", "&")
-                title = raw_title.strip() or title
+    def timed(data: Dict) -> Dict:
+        if not timing["fetch_ms"]:
+            timing["fetch_ms"] = _ms(start)
+        data.update(timing)
+        return data
 
-            for tag in soup(["script", "style", "nav", "footer", "header",
-                              "noscript", "iframe", "form", "button"]):
-                tag.decompose()
+    try:
+        session  = get_tor_session(isolation_key(url))
+        response = session.get(url, headers=headers, timeout=SCRAPE_TIMEOUT, stream=True)
+        timing["ttfb_ms"] = _ms(start)
+        report_scrape(True)
+        code     = response.status_code
 
-           
-            text = soup.get_text(separator=" ")
-            text = " ".join(text.split())  
+        if code == 304 and cached:
+            response.close()
+            cache.touch(key)
+            cache.hit(revalidated=True)
+            return url, timed(_from_cache(cached, title)), None
+        if cache:
+            cache.miss()
 
-            if len(text) > MAX_CONTENT_CHARS:
-                text = text[:MAX_CONTENT_CHARS] + "...[truncated]"
+        if code == 200:
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if content_type not in _HTML_TYPES:
+                response.close()
+                return url, timed({
+                    "title":       title,
+                    "content":     f"[Non-HTML content: {content_type[:40]}]",
+                    "status":      "online",
+                    "status_code": code,
+                }), None
 
-            return url, {
-                "title":       title,
-                "content":     text,
-                "status":      "online",
-                "status_code": code,
-            }
+            html, timing["bytes"] = _read_capped(response, max_bytes)
+            return url, timed({
+                "title":         title,
+                "content":       "",
+                "status":        "online",
+                "status_code":   code,
+                "etag":          response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }), html
         else:
-            return url, {
+            response.close()
+            return url, timed({
                 "title":       title,
                 "content":     f"[HTTP {code}]",
                 "status":      "offline",
                 "status_code": code,
-            }
+            }), None
 
     except requests.exceptions.Timeout:
-        return url, {"title": title, "content": "[Timeout]",  "status": "offline", "status_code": None}
+        report_scrape(False)
+        return url, timed({"title": title, "content": "[Timeout]",  "status": "offline", "status_code": None}), None
     except requests.exceptions.ConnectionError as e:
         err = str(e)
         if "SOCKS" in err or "unreachable" in err.lower():
-            return url, {"title": title, "content": "[Tor unreachable]", "status": "offline", "status_code": None}
-        return url, {"title": title, "content": "[Connection error]", "status": "offline", "status_code": None}
+            return url, timed({"title": title, "content": "[Tor unreachable]", "status": "offline", "status_code": None}), None
+        report_scrape(False)
+        return url, timed({"title": title, "content": "[Connection error]", "status": "offline", "status_code": None}), None
     except Exception as e:
-        return url, {"title": title, "content": f"[Error: {str(e)[:80]}]", "status": "error", "status_code": None}
+        return url, timed({"title": title, "content": f"[Error: {str(e)[:80]}]", "status": "error", "status_code": None}), None
+
+
+def _fetch_and_parse(url_data: Dict, max_bytes: int = MAX_DOWNLOAD_BYTES) -> tuple:
+    url, data, html = fetch_raw(url_data, max_bytes)
+    if html is not None:
+        try:
+            data["title"], data["content"] = parse_page(html, data["title"])
+        except Exception as e:
+            data.update({"content": f"[Error: {str(e)[:80]}]", "status": "error"})
+    return url, data
+
+
+def scrape_single(url_data: Dict, max_bytes: int = MAX_DOWNLOAD_BYTES) -> tuple:
+    url, data = _fetch_and_parse(url_data, max_bytes)
+    _remember(url, data)
+    return url, data
 
 
+_PARSE_POOL: Optional[ProcessPoolExecutor] = None
+_PARSE_POOL_LOCK = threading.Lock()
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Process pool for the parse stage, sized to the machine and shared across hunts."""
+    global _PARSE_POOL
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is None:
+            # spawn, not fork: the parent is full of live I/O threads
+            _PARSE_POOL = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 2,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _PARSE_POOL
+
+
+def scrape_stream(
+    urls_data: List[Dict],
+    max_workers: int = 5,
+    max_online: Optional[int] = None,
+    parse_pool: Optional[Executor] = None,
+) -> Iterator[Tuple[Dict, str, Dict]]:
+    """
+    Sliding-window scheduler: keeps max_workers fetches in flight and submits
+    the next URL (in the given order) as soon as a slot frees up.
+    Yields (item, url, data) as each page completes. Stops once max_online
+    sites came back online, dropping whatever is still queued or in flight.
+
+    With parse_pool set, fetch threads only pull raw HTML; pages larger than
+    PARSE_INLINE_BYTES are parsed in the pool so a big page never holds the
+    GIL against the other fetches. Both stages report back through one queue.
+    """
+    pending_urls = iter(urls_data)
+    executor     = ThreadPoolExecutor(max_workers=max_workers)
+    events: "queue.Queue[Tuple]" = queue.Queue()
+    in_fetch = 0
+    in_parse = 0
+    online   = 0
+
+    def fill():
+        nonlocal in_fetch
+        while in_fetch < max_workers:
+            item = next(pending_urls, None)
+            if item is None:
+                return
+            stage = fetch_raw if parse_pool is not None else _fetch_and_parse
+            future = executor.submit(stage, item)
+            future.add_done_callback(lambda f, item=item: events.put(("fetched", item, f)))
+            in_fetch += 1
+
+    def failed(item: Dict, e: Exception) -> Tuple[str, Dict]:
+        url = item.get("link", "")
+        return url, {"title": item.get("title", url), "content": f"[Error: {str(e)[:80]}]",
+                     "status": "error", "status_code": None}
+
+    try:
+        fill()
+        while in_fetch or in_parse:
+            kind, item, payload = events.get()
+
+            if kind == "fetched":
+                in_fetch -= 1
+                fill()
+                try:
+                    result = payload.result()
+                except Exception as e:
+                    result = (*failed(item, e), None)
+
+                if parse_pool is None:
+                    url, data = result
+                else:
+                    url, data, html = result
+                    # bytes is the body size _read_capped pulled off the wire; len(html) would count characters
+                    if html is not None and data.get("bytes", 0) > PARSE_INLINE_BYTES:
+                        try:
+                            parsed = parse_pool.submit(parse_page, html, data["title"])
+                        except Exception:
+                            parsed = None   # broken/shut-down pool — parse inline below
+                        if parsed is not None:
+                            parsed.add_done_callback(
+                                lambda f, item=item, url=url, data=data: events.put(("parsed", item, (f, url, data)))
+                            )
+                            in_parse += 1
+                            continue
+                    if html is not None:
+                        try:
+                            data["title"], data["content"] = parse_page(html, data["title"])
+                        except Exception as e:
+                            url, data = failed(item, e)
+            else:
+                in_parse -= 1
+                parsed, url, data = payload
+                try:
+                    data["title"], data["content"] = parsed.result()
+                except Exception as e:
+                    url, data = failed(item, e)
+
+            _remember(url, data)
+            if data.get("status") == "online":
+                online += 1
+            yield item, url, data
+
+            if max_online is not None and online >= max_online:
+                return
+    finally:
+        # in-flight requests finish in the background; nothing queued gets started
+        executor.shutdown(wait=False, cancel_futures=True)
+
 
 def scrape_multiple(
     urls_data: List[Dict],
     max_workers: int = 5,
+    parse_pool: Optional[Executor] = None,
 ) -> Dict[str, Dict]:
-    results: Dict[str, Dict] = {}
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_map = {
-            executor.submit(scrape_single, item): item
-            for item in urls_data
-        }
-        for future in as_completed(future_map):
-            try:
-                url, data = future.result()
-                results[url] = data
-            except Exception:
-                continue
-
-    return results
+    return {
+        url: data
+        for _, url, data in scrape_stream(urls_data, max_workers=max_workers, parse_pool=parse_pool)
+    }
 
 
 def scrape_urls(urls: List[str], max_workers: int = 5) -> Dict[str, Dict]:
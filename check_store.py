@@ -0,0 +1,449 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from stats import percentile
+
+CHECKS_DB        = os.getenv("ROTTWEILER_CHECKS_DB", os.path.join(os.path.dirname(__file__), "monitor.sqlite3"))
+RAW_RETENTION    = int(os.getenv("ROTTWEILER_RAW_RETENTION_DAYS", "3")) * 86400       # raw checks
+HOURLY_RETENTION = int(os.getenv("ROTTWEILER_HOURLY_RETENTION_DAYS", "30")) * 86400   # hourly rollups
+DAILY_RETENTION  = int(os.getenv("ROTTWEILER_DAILY_RETENTION_DAYS", "365")) * 86400   # daily rollups
+
+TIERS = {"hourly": 3600, "daily": 86400}
+
+# (url, epoch seconds, status, status_code, response_time ms, ttfb ms, body bytes)
+CheckRow = Tuple[str, float, str, Optional[int], int, Optional[int], Optional[int]]
+
+_INSERT_CHECK = "INSERT INTO checks (url, ts, status, status_code, response_time, ttfb, bytes) VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+
+def _to_epoch(iso: str) -> float:
+    dt = datetime.fromisoformat(iso)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _to_iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def _floor(ts: float, span: int) -> float:
+    return float(int(ts // span) * span)
+
+
+def _merge_rollups(a: tuple, b: tuple) -> tuple:
+    """Combines two (checks, online, rt_min, rt_avg, rt_p95, codes) aggregates of one bucket."""
+    n = a[0] + b[0]
+    online = a[1] + b[1]
+    mins = [x for x in (a[2], b[2]) if x]
+    timed = [(avg, up) for avg, up in ((a[3], a[1]), (b[3], b[1])) if avg and up]
+    codes = dict(a[5])
+    for code, count in b[5].items():
+        codes[code] = codes.get(code, 0) + count
+    return (
+        n, online,
+        min(mins) if mins else 0,
+        int(sum(avg * up for avg, up in timed) / sum(up for _, up in timed)) if timed else 0,
+        # the exact p95 of the union isn't recoverable; the worse of the two bounds it
+        max(a[4], b[4]),
+        codes,
+    )
+
+
+class CheckStore:
+    """
+    Append-only uptime history in SQLite (WAL). Tracked sites live in one
+    table, every check is a row in another, indexed by (url, ts), so a sweep
+    is a single executemany and per-site time-range reads never scan.
+    """
+
+    def __init__(self, path: str = CHECKS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sites (
+                url       TEXT PRIMARY KEY,
+                title     TEXT,
+                tags      TEXT,
+                added_at  TEXT,
+                found_at  REAL
+            );
+            CREATE TABLE IF NOT EXISTS checks (
+                url            TEXT NOT NULL,
+                ts             REAL NOT NULL,
+                status         TEXT NOT NULL,
+                status_code    INTEGER,
+                response_time  INTEGER,
+                ttfb           INTEGER,
+                bytes          INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS checks_url_ts ON checks(url, ts);
+            CREATE INDEX IF NOT EXISTS checks_ts ON checks(ts);
+            CREATE TABLE IF NOT EXISTS rollups (
+                tier      TEXT NOT NULL,
+                url       TEXT NOT NULL,
+                bucket    REAL NOT NULL,
+                checks    INTEGER,
+                online    INTEGER,
+                rt_min    INTEGER,
+                rt_avg    INTEGER,
+                rt_p95    INTEGER,
+                codes     TEXT,
+                PRIMARY KEY (tier, url, bucket)
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key    TEXT PRIMARY KEY,
+                value  TEXT
+            );
+            """
+        )
+        # databases created before ttfb/bytes were recorded
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(checks)")}
+        for column in ("ttfb", "bytes"):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE checks ADD COLUMN {column} INTEGER")
+        # ... and before hunt-found sites were told apart from ones tracked by hand
+        if "found_at" not in {row[1] for row in self._db.execute("PRAGMA table_info(sites)")}:
+            self._db.execute("ALTER TABLE sites ADD COLUMN found_at REAL")
+        self._db.commit()
+
+    # SITES
+
+    def upsert_site(self, url: str, title: str, tags: Sequence[str], added_at: str,
+                    found_at: Optional[float] = None):
+        """found_at is when a hunt last found the site; None for sites tracked by hand."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sites (url, title, tags, added_at, found_at) VALUES (?, ?, ?, ?, ?)",
+                (url, title, json.dumps(list(tags)), added_at, found_at),
+            )
+            self._db.commit()
+
+    def remove_site(self, url: str, keep_history: bool = False):
+        with self._lock:
+            self._db.execute("DELETE FROM sites WHERE url = ?", (url,))
+            if not keep_history:
+                self._db.execute("DELETE FROM checks WHERE url = ?", (url,))
+                self._db.execute("DELETE FROM rollups WHERE url = ?", (url,))
+            self._db.commit()
+
+    def get_sites(self) -> Dict[str, Dict]:
+        """Tracked sites with their most recent check (no history)."""
+        with self._lock:
+            rows = self._db.execute(
+                """SELECT s.url, s.title, s.tags, s.added_at, s.found_at,
+                          c.ts, c.status, c.status_code, c.response_time
+                   FROM sites s
+                   LEFT JOIN checks c
+                     ON c.url = s.url
+                    AND c.ts = (SELECT MAX(ts) FROM checks WHERE url = s.url)"""
+            ).fetchall()
+
+        sites: Dict[str, Dict] = {}
+        for url, title, tags, added_at, found_at, ts, status, code, rt in rows:
+            sites[url] = {
+                "url":        url,
+                "title":      title,
+                "tags":       json.loads(tags or "[]"),
+                "added_at":   added_at,
+                "found_at":   found_at,
+                "last_check": None if ts is None else {
+                    "time":          _to_iso(ts),
+                    "ts":            ts,
+                    "status":        status,
+                    "status_code":   code,
+                    "response_time": rt,
+                },
+            }
+        return sites
+
+    # CHECKS
+
+    def insert_checks(self, rows: Iterable[CheckRow]) -> int:
+        rows = list(rows)
+        if not rows:
+            return 0
+        with self._lock:
+            self._insert(rows)
+            self._db.commit()
+        return len(rows)
+
+    def _insert(self, rows: List[CheckRow]):
+        # caller holds _lock
+        raw_from = self._db.execute("SELECT MIN(ts) FROM checks").fetchone()[0]
+        self._db.executemany(_INSERT_CHECK, rows)
+        self._backfill(rows, float("inf") if raw_from is None else raw_from)
+
+    def get_checks(self, url: str, since: Optional[float] = None, until: Optional[float] = None) -> List[Dict]:
+        """Checks for one site, oldest first, optionally bounded to [since, until) epoch seconds."""
+        sql = "SELECT ts, status, status_code, response_time, ttfb, bytes FROM checks WHERE url = ?"
+        args: list = [url]
+        if since is not None:
+            sql += " AND ts >= ?"
+            args.append(since)
+        if until is not None:
+            sql += " AND ts < ?"
+            args.append(until)
+        sql += " ORDER BY ts"
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        return [
+            {"time": _to_iso(ts), "ts": ts, "status": status, "status_code": code, "response_time": rt,
+             "ttfb": ttfb, "bytes": nbytes}
+            for ts, status, code, rt, ttfb, nbytes in rows
+        ]
+
+    def count_checks(self, url: Optional[str] = None) -> int:
+        with self._lock:
+            if url is None:
+                return self._db.execute("SELECT COUNT(*) FROM checks").fetchone()[0]
+            return self._db.execute("SELECT COUNT(*) FROM checks WHERE url = ?", (url,)).fetchone()[0]
+
+    # ROLLUPS
+
+    def _meta(self, key: str, default: float = 0.0) -> float:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return float(row[0]) if row else default
+
+    def _set_meta(self, key: str, value: float):
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+    @staticmethod
+    def _aggregate(checks: List[Tuple[str, Optional[int], int]]) -> Tuple[int, int, int, int, int, Dict[str, int]]:
+        """(checks, online, rt_min, rt_avg, rt_p95, codes) for one bucket's (status, code, rt) checks."""
+        times = [rt for status, _, rt in checks if status == "online" and rt > 0]
+        codes: Dict[str, int] = defaultdict(int)
+        for _, code, _ in checks:
+            codes[str(code) if code is not None else "none"] += 1
+        return (
+            len(checks),
+            sum(1 for status, _, _ in checks if status == "online"),
+            min(times) if times else 0,
+            int(sum(times) / len(times)) if times else 0,
+            percentile(times, 95),
+            dict(codes),
+        )
+
+    def _backfill(self, rows: List[CheckRow], raw_from: float):
+        """
+        Checks older than a tier's watermark land in buckets _roll has already
+        passed and won't revisit (an import into a live database). Those
+        buckets are re-rolled: from raw when all of the bucket's raw checks
+        are still there (raw is only ever trimmed from the oldest end, so
+        that is any bucket from raw_from on), otherwise by merging the new
+        checks into the stored rollup. Caller holds _lock.
+        """
+        for tier, span in TIERS.items():
+            mark = self._meta(f"rolled:{tier}")
+            late: Dict[Tuple[str, float], List[Tuple[str, Optional[int], int]]] = defaultdict(list)
+            for url, ts, status, code, rt, *_ in rows:
+                if ts < mark and status != "unknown":
+                    late[(url, _floor(ts, span))].append((status, code, rt or 0))
+
+            out = []
+            for (url, bucket), checks in late.items():
+                if bucket >= raw_from:
+                    checks = [(status, code, rt or 0) for status, code, rt in self._db.execute(
+                        "SELECT status, status_code, response_time FROM checks "
+                        "WHERE url = ? AND ts >= ? AND ts < ? AND status != 'unknown'",
+                        (url, bucket, bucket + span),
+                    )]
+                    agg = self._aggregate(checks)
+                else:
+                    agg = self._aggregate(checks)
+                    old = self._db.execute(
+                        "SELECT checks, online, rt_min, rt_avg, rt_p95, codes FROM rollups "
+                        "WHERE tier = ? AND url = ? AND bucket = ?", (tier, url, bucket),
+                    ).fetchone()
+                    if old:
+                        agg = _merge_rollups((*old[:5], json.loads(old[5] or "{}")), agg)
+                n, online, rt_min, rt_avg, rt_p95, codes = agg
+                out.append((tier, url, bucket, n, online, rt_min, rt_avg, rt_p95, json.dumps(codes)))
+            self._db.executemany("INSERT OR REPLACE INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", out)
+
+    def _roll(self, tier: str, end: float) -> int:
+        """Aggregates raw checks in complete buckets up to end; returns buckets written."""
+        span = TIERS[tier]
+        start = self._meta(f"rolled:{tier}")
+        if start == 0.0:
+            first = self._db.execute("SELECT MIN(ts) FROM checks").fetchone()[0]
+            if first is None:
+                return 0
+            start = _floor(first, span)
+        if start >= end:
+            return 0
+
+        groups: Dict[Tuple[str, float], List[Tuple[str, Optional[int], int]]] = defaultdict(list)
+        for url, ts, status, code, rt in self._db.execute(
+            "SELECT url, ts, status, status_code, response_time FROM checks WHERE ts >= ? AND ts < ?",
+            (start, end),
+        ):
+            # 'unknown' means Tor itself was down — it says nothing about the site
+            if status != "unknown":
+                groups[(url, _floor(ts, span))].append((status, code, rt or 0))
+
+        rows = []
+        for (url, bucket), checks in groups.items():
+            n, online, rt_min, rt_avg, rt_p95, codes = self._aggregate(checks)
+            rows.append((tier, url, bucket, n, online, rt_min, rt_avg, rt_p95, json.dumps(codes)))
+        self._db.executemany("INSERT OR REPLACE INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self._set_meta(f"rolled:{tier}", end)
+        return len(rows)
+
+    def compact(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Rolls complete hours and days of raw checks into the rollups table,
+        then applies per-tier retention. Raw rows are only dropped once both
+        tiers have consumed them, so it is safe to run at any interval.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            hourly = self._roll("hourly", _floor(now, TIERS["hourly"]))
+            daily = self._roll("daily", _floor(now, TIERS["daily"]))
+            hourly_wm = self._meta("rolled:hourly")
+            daily_wm = self._meta("rolled:daily")
+
+            raw_cut = min(now - RAW_RETENTION, hourly_wm, daily_wm)
+            hourly_cut = min(_floor(now - HOURLY_RETENTION, TIERS["daily"]), daily_wm)
+            daily_cut = now - DAILY_RETENTION
+
+            raw_gone = self._db.execute("DELETE FROM checks WHERE ts < ?", (raw_cut,)).rowcount
+            hourly_gone = self._db.execute(
+                "DELETE FROM rollups WHERE tier = 'hourly' AND bucket < ?", (hourly_cut,)
+            ).rowcount
+            daily_gone = self._db.execute(
+                "DELETE FROM rollups WHERE tier = 'daily' AND bucket < ?", (daily_cut,)
+            ).rowcount
+            self._set_meta("hourly_floor", max(self._meta("hourly_floor"), hourly_cut))
+            self._db.commit()
+
+        stats = {"hourly": hourly, "daily": daily, "raw_deleted": raw_gone,
+                 "hourly_deleted": hourly_gone, "daily_deleted": daily_gone}
+        print(f"[CHECKS] compact {stats}")
+        return stats
+
+    def get_buckets(self, url: str, since: float, until: Optional[float] = None) -> List[Dict]:
+        """
+        History for one site as uniform buckets, oldest first:
+        daily rollups where only those survive, hourly rollups up to the
+        last rolled hour, raw checks after that (one check per bucket).
+        """
+        until = time.time() if until is None else until
+        with self._lock:
+            hourly_wm = self._meta("rolled:hourly")
+            hourly_floor = min(self._meta("hourly_floor"), hourly_wm)
+            parts = [
+                ("daily", since, min(until, hourly_floor)),
+                ("hourly", max(since, hourly_floor), min(until, hourly_wm)),
+            ]
+            out: List[Dict] = []
+            for tier, lo, hi in parts:
+                if lo >= hi:
+                    continue
+                for bucket, checks, online, rt_min, rt_avg, rt_p95, codes in self._db.execute(
+                    "SELECT bucket, checks, online, rt_min, rt_avg, rt_p95, codes FROM rollups "
+                    "WHERE tier = ? AND url = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+                    (tier, url, lo, hi),
+                ):
+                    out.append({"ts": bucket, "span": TIERS[tier], "checks": checks, "online": online,
+                                "rt_min": rt_min, "rt_avg": rt_avg, "rt_p95": rt_p95,
+                                "codes": json.loads(codes or "{}")})
+
+            for ts, status, code, rt in self._db.execute(
+                "SELECT ts, status, status_code, response_time FROM checks "
+                "WHERE url = ? AND ts >= ? AND ts < ? AND status != 'unknown' ORDER BY ts",
+                (url, max(since, hourly_wm), until),
+            ):
+                rt = (rt or 0) if status == "online" else 0
+                out.append({"ts": ts, "span": 0, "checks": 1, "online": int(status == "online"),
+                            "rt_min": rt, "rt_avg": rt, "rt_p95": rt,
+                            "codes": {str(code) if code is not None else "none": 1}})
+        return out
+
+    def uptime(self, url: str, since: float, until: Optional[float] = None) -> Dict:
+        """Online ratio, response times and status codes over a window, read from the rollups."""
+        buckets = self.get_buckets(url, since, until)
+        checks = sum(b["checks"] for b in buckets)
+        online = sum(b["online"] for b in buckets)
+        timed = [b for b in buckets if b["online"] and b["rt_avg"]]
+        codes: Dict[str, int] = defaultdict(int)
+        for b in buckets:
+            for code, n in b["codes"].items():
+                codes[code] += n
+        return {
+            "checks":     checks,
+            "online":     online,
+            "uptime_pct": round(100 * online / checks, 1) if checks else None,
+            "rt_min":     min((b["rt_min"] for b in timed), default=0),
+            "rt_avg":     int(sum(b["rt_avg"] * b["online"] for b in timed) / sum(b["online"] for b in timed)) if timed else 0,
+            # worst bucket p95 — an upper bound, exact p95 isn't recoverable from rollups
+            "rt_p95":     max((b["rt_p95"] for b in timed), default=0),
+            "codes":      dict(codes),
+        }
+
+    # IMPORT
+
+    def import_json(self, path: str, force: bool = False) -> int:
+        """
+        One-shot import of a legacy monitor.json. Remembers what it imported,
+        so calling it again on every start is a no-op unless force=True.
+        """
+        key = f"imported:{os.path.abspath(path)}"
+        with self._lock:
+            done = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        if done and not force:
+            return 0
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                sites = json.load(f).get("sites", {})
+        except FileNotFoundError:
+            return 0
+
+        rows: List[CheckRow] = []
+        with self._lock:
+            for url, site in sites.items():
+                self._db.execute(
+                    "INSERT OR IGNORE INTO sites (url, title, tags, added_at) VALUES (?, ?, ?, ?)",
+                    (url, site.get("title") or url, json.dumps(site.get("tags", [])),
+                     site.get("added_at") or datetime.now(timezone.utc).isoformat()),
+                )
+                for c in site.get("checks", []):
+                    try:
+                        rows.append((url, _to_epoch(c["time"]), c.get("status", "unknown"),
+                                     c.get("status_code"), c.get("response_time", 0) or 0, None, None))
+                    except Exception:
+                        continue
+            self._insert(rows)
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                (key, datetime.now(timezone.utc).isoformat()),
+            )
+            self._db.commit()
+
+        print(f"[CHECKS] imported {len(sites)} sites / {len(rows)} checks from {path}")
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+if __name__ == "__main__":
+    # python check_store.py monitor.json [db path]
+    if len(sys.argv) < 2:
+        print("usage: python check_store.py <monitor.json> [db path]")
+        sys.exit(1)
+    store = CheckStore(sys.argv[2] if len(sys.argv) > 2 else CHECKS_DB)
+    store.import_json(sys.argv[1], force=True)
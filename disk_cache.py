@@ -0,0 +1,104 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+CACHE_DIR = os.getenv("ROTTWEILER_CACHE_DIR", ".cache")
+
+T = TypeVar("T")
+
+
+class DiskCache:
+    """
+    SQLite store behind the page and LLM caches. A subclass names its table,
+    file and payload columns; every row also carries its key, when it was
+    last used and its size. The table is capped at max_bytes of payload,
+    least-recently-used rows out first. What ttl means is up to the subclass.
+    """
+
+    TABLE: str = ""
+    FILENAME: str = ""
+    COLUMNS: Tuple[str, ...] = ()      # payload column definitions, stored between key and accessed_at
+    STATS: Tuple[str, ...] = ("hits", "misses", "stores", "evictions")
+
+    def __init__(self, path: Optional[str], ttl: int, max_bytes: int):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, self.FILENAME)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        columns = ",\n".join(["key TEXT PRIMARY KEY", *self.COLUMNS, "accessed_at REAL", "size INTEGER"])
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS {self.TABLE} (\n{columns}\n)")
+        self._db.execute(f"CREATE INDEX IF NOT EXISTS {self.TABLE}_lru ON {self.TABLE}(accessed_at)")
+        self._db.commit()
+        self._total = self._db.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.TABLE}").fetchone()[0]
+        self.stats = {name: 0 for name in self.STATS}
+
+    def _select(self, key: str, columns: str) -> Optional[tuple]:
+        # caller holds _lock
+        return self._db.execute(f"SELECT {columns} FROM {self.TABLE} WHERE key = ?", (key,)).fetchone()
+
+    def _used(self, key: str, now: float):
+        # caller holds _lock
+        self._db.execute(f"UPDATE {self.TABLE} SET accessed_at = ? WHERE key = ?", (now, key))
+        self._db.commit()
+
+    def _store(self, key: str, values: tuple, size: int):
+        """Writes one row (payload values in COLUMNS order) and evicts down to max_bytes."""
+        now = time.time()
+        placeholders = ", ".join("?" * (len(values) + 3))
+        with self._lock:
+            old = self._select(key, "size")
+            if old:
+                self._total -= old[0]
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.TABLE} VALUES ({placeholders})",
+                (key, *values, now, size),
+            )
+            self._total += size
+            self.stats["stores"] += 1
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        while self._total > self.max_bytes:
+            row = self._db.execute(
+                f"SELECT key, size FROM {self.TABLE} ORDER BY accessed_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self._total = 0
+                return
+            self._db.execute(f"DELETE FROM {self.TABLE} WHERE key = ?", (row[0],))
+            self._total -= row[1]
+            self.stats["evictions"] += 1
+
+    def summary(self) -> Dict:
+        with self._lock:
+            count = self._db.execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
+            return {**self.stats, "entries": count, "bytes": self._total}
+
+    def clear(self):
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.TABLE}")
+            self._db.commit()
+            self._total = 0
+
+
+def shared_cache(factory: Callable[[], T], enabled: bool) -> Callable[[], Optional[T]]:
+    """Getter for a process-wide instance, built on first call. Returns None when the cache is disabled."""
+    instance = []
+    lock = threading.Lock()
+
+    def get() -> Optional[T]:
+        if not enabled:
+            return None
+        with lock:
+            if not instance:
+                instance.append(factory())
+            return instance[0]
+
+    return get
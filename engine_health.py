@@ -0,0 +1,168 @@
+import time
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from stats import percentile
+
+HEALTH_WINDOW     = 50     # samples kept per engine
+FAILURE_THRESHOLD = 3      # consecutive failures that open the breaker
+BREAKER_COOLDOWN  = 600    # seconds before a half-open trial request
+MIN_SAMPLES       = 5      # successful samples needed before timeouts adapt
+MIN_TIMEOUT       = 8      # seconds
+TIMEOUT_HEADROOM  = 1.5    # timeout = p95 × headroom
+HEDGE_RATIO       = 0.1    # hedged requests allowed per primary request
+HEDGE_BURST       = 3      # hedges that can be spent back to back
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of querying an engine whose breaker is open."""
+
+
+class EngineHealth:
+    def __init__(self, name: str):
+        self.name = name
+        # (latency seconds, ok, result count, timed out)
+        self.samples: Deque[Tuple[float, bool, int, bool]] = deque(maxlen=HEALTH_WINDOW)
+        self.consecutive_failures = 0
+        self.state = "closed"            # closed | open | half_open
+        self.opened_at: Optional[float] = None
+        self.trial_at: Optional[float] = None
+        self.last_error = ""
+
+    def latencies(self) -> List[float]:
+        # timeouts count at the time we waited, so a too-tight timeout widens itself
+        return [lat for lat, ok, _, timed_out in self.samples if ok or timed_out]
+
+    def snapshot(self) -> Dict:
+        total  = len(self.samples)
+        errors = sum(1 for _, ok, _, _ in self.samples if not ok)
+        lats   = self.latencies()
+        oks    = [n for _, ok, n, _ in self.samples if ok]
+        return {
+            "name":        self.name,
+            "state":       self.state,
+            "samples":     total,
+            "error_rate":  round(errors / total, 3) if total else 0.0,
+            "p50":         round(percentile(lats, 50), 2),
+            "p95":         round(percentile(lats, 95), 2),
+            "avg_yield":   round(sum(oks) / len(oks), 1) if oks else 0.0,
+            "last_error":  self.last_error,
+        }
+
+
+class HealthRegistry:
+    """
+    Per-engine latency, error-rate and yield tracking across hunts, with a
+    circuit breaker and timeouts derived from each engine's observed p95.
+    """
+
+    def __init__(self, default_timeout: float):
+        self.default_timeout = default_timeout
+        self._engines: Dict[str, EngineHealth] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str) -> EngineHealth:
+        h = self._engines.get(name)
+        if h is None:
+            h = self._engines[name] = EngineHealth(name)
+        return h
+
+    def allow(self, name: str) -> bool:
+        """Closed: yes. Open: no, until the cooldown passes and one half-open trial goes out."""
+        with self._lock:
+            h = self._get(name)
+            if h.state == "closed":
+                return True
+            now = time.time()
+            if h.state == "open" and now - (h.opened_at or 0) >= BREAKER_COOLDOWN:
+                h.state = "half_open"
+                h.trial_at = now
+                return True
+            # a trial that never reported back (e.g. Tor itself was down) doesn't block forever
+            if h.state == "half_open" and now - (h.trial_at or 0) >= BREAKER_COOLDOWN:
+                h.trial_at = now
+                return True
+            return False
+
+    def record(self, name: str, latency: float, ok: bool, results: int = 0, error: str = "",
+               timed_out: bool = False):
+        with self._lock:
+            h = self._get(name)
+            h.samples.append((latency, ok, results, timed_out))
+            if ok:
+                h.consecutive_failures = 0
+                h.state = "closed"
+                h.opened_at = None
+                return
+
+            h.last_error = error[:80]
+            h.consecutive_failures += 1
+            if h.state == "half_open" or h.consecutive_failures >= FAILURE_THRESHOLD:
+                if h.state != "open":
+                    print(f"[{name}] circuit OPEN after {h.consecutive_failures} failures")
+                h.state = "open"
+                h.opened_at = time.time()
+
+    def timeout_for(self, name: str) -> float:
+        with self._lock:
+            lats = self._get(name).latencies()
+        if len(lats) < MIN_SAMPLES:
+            return self.default_timeout
+        return min(self.default_timeout, max(MIN_TIMEOUT, percentile(lats, 95) * TIMEOUT_HEADROOM))
+
+    def hedge_delay(self, name: str) -> Optional[float]:
+        """The engine's p50 latency — how long to wait before hedging — or None without enough samples."""
+        with self._lock:
+            lats = self._get(name).latencies()
+        if len(lats) < MIN_SAMPLES:
+            return None
+        return percentile(lats, 50)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: h.snapshot() for name, h in self._engines.items()}
+
+    def reset(self, name: Optional[str] = None):
+        with self._lock:
+            if name is None:
+                self._engines.clear()
+            else:
+                self._engines.pop(name, None)
+
+
+class HedgeBudget:
+    """
+    Token bucket for hedged requests: every primary request earns `ratio`
+    tokens (up to `burst`), every hedge spends one, so hedging adds at most
+    ~ratio extra load however slow the engines get.
+    """
+
+    def __init__(self, ratio: float = HEDGE_RATIO, burst: float = HEDGE_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "hedged": 0, "denied": 0, "hedge_wins": 0}
+
+    def earn(self):
+        with self._lock:
+            self.stats["requests"] += 1
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                self.stats["denied"] += 1
+                return False
+            self._tokens -= 1
+            self.stats["hedged"] += 1
+            return True
+
+    def won(self):
+        with self._lock:
+            self.stats["hedge_wins"] += 1
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "tokens": round(self._tokens, 2)}
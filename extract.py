@@ -0,0 +1,139 @@
+import abc
+import warnings
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+warnings.filterwarnings("ignore")
+
+# subtrees that never carry page content
+SKIP_TAGS = frozenset({
+    "script", "style", "nav", "footer", "header",
+    "noscript", "iframe", "form", "button",
+})
+
+
+class Extractor(abc.ABC):
+    """
+    Turns raw HTML into what the scraper and search engines need.
+    page()  -> (title, whitespace-collapsed text), text cut at max_chars when > 0
+    links() -> [(href, anchor text)] for every <a href>
+    """
+    name = "base"
+
+    @abc.abstractmethod
+    def page(self, html: str, max_chars: int = 0) -> Tuple[str, str]: ...
+
+    @abc.abstractmethod
+    def links(self, html: str) -> List[Tuple[str, str]]: ...
+
+
+class SoupExtractor(Extractor):
+    """Reference path: BeautifulSoup + html.parser, decomposing SKIP_TAGS."""
+    name = "soup"
+
+    def page(self, html: str, max_chars: int = 0) -> Tuple[str, str]:
+        soup = BeautifulSoup(html, "html.parser")
+
+        title = ""
+        title_tag = soup.find("title")
+        if title_tag:
+            title = title_tag.get_text(strip=True)
+
+        for tag in soup(list(SKIP_TAGS)):
+            tag.decompose()
+
+        text = " ".join(soup.get_text(separator=" ").split())
+        return title, text[:max_chars] if max_chars else text
+
+    def links(self, html: str) -> List[Tuple[str, str]]:
+        soup = BeautifulSoup(html, "html.parser")
+        return [(a["href"], a.get_text(strip=True)) for a in soup.find_all("a", href=True)]
+
+
+class LxmlExtractor(Extractor):
+    """
+    Fast path: lxml's C parser plus one iterative walk that skips SKIP_TAGS
+    subtrees entirely and stops once max_chars of text have been collected.
+    """
+    name = "lxml"
+
+    @staticmethod
+    def _parse(html: str):
+        if not html or not html.strip():
+            return None
+        try:
+            return lxml.html.fromstring(html)
+        except ValueError:
+            # str input carrying an <?xml encoding=...?> declaration
+            return lxml.html.fromstring(html.encode("utf-8", errors="replace"))
+        except Exception:
+            return None
+
+    def page(self, html: str, max_chars: int = 0) -> Tuple[str, str]:
+        root = self._parse(html)
+        if root is None:
+            return "", ""
+
+        title = ""
+        title_el = root.find(".//title")
+        if title_el is not None:
+            title = "".join(s.strip() for s in title_el.itertext())
+
+        parts: List[str] = []
+        size  = 0
+
+        def add(chunk: str):
+            nonlocal size
+            piece = " ".join(chunk.split())
+            if piece:
+                parts.append(piece)
+                size += len(piece) + 1
+
+        # (element, entering) — tails are emitted after the element's subtree
+        stack = [(root, True)]
+        while stack and not (max_chars and size > max_chars):
+            el, entering = stack.pop()
+            if not entering:
+                if el.tail:
+                    add(el.tail)
+                continue
+
+            stack.append((el, False))
+            tag = el.tag
+            # comments / processing instructions have non-str tags
+            if not isinstance(tag, str) or tag.lower() in SKIP_TAGS:
+                continue
+            if el.text:
+                add(el.text)
+            stack.extend((child, True) for child in reversed(el))
+
+        text = " ".join(parts)
+        return title, text[:max_chars] if max_chars else text
+
+    def links(self, html: str) -> List[Tuple[str, str]]:
+        root = self._parse(html)
+        if root is None:
+            return []
+        return [
+            (a.get("href"), "".join(s.strip() for s in a.itertext()))
+            for a in root.iter("a")
+            if a.get("href")
+        ]
+
+
+EXTRACTORS: Dict[str, Extractor] = {"soup": SoupExtractor()}
+if HAS_LXML:
+    EXTRACTORS["lxml"] = LxmlExtractor()
+
+DEFAULT_EXTRACTOR = "lxml" if HAS_LXML else "soup"
+
+
+def get_extractor(name: Optional[str] = None) -> Extractor:
+    return EXTRACTORS.get(name or DEFAULT_EXTRACTOR, EXTRACTORS[DEFAULT_EXTRACTOR])
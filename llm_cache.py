@@ -0,0 +1,61 @@
+import os
+import json
+import time
+import hashlib
+from typing import Dict, Optional
+
+from disk_cache import DiskCache, shared_cache
+
+LLM_CACHE_ON   = os.getenv("ROTTWEILER_LLM_CACHE", "1") != "0"
+LLM_CACHE_TTL  = int(os.getenv("ROTTWEILER_LLM_CACHE_TTL", str(24 * 3600)))     # seconds
+LLM_CACHE_SIZE = int(os.getenv("ROTTWEILER_LLM_CACHE_MB", "32")) * 1024 * 1024   # bytes
+
+
+def response_key(provider: str, model_id: str, system: str, user: str, max_tokens: int) -> str:
+    """Content address of one completion request."""
+    raw = json.dumps([provider, model_id, system, user, max_tokens], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache(DiskCache):
+    """
+    On-disk cache of LLM completions, keyed by response_key(). Entries older
+    than ttl are ignored and overwritten; the store is capped at max_bytes
+    of response text, least-recently-used first out.
+    """
+
+    TABLE = "responses"
+    FILENAME = "llm.sqlite3"
+    COLUMNS = (
+        "model        TEXT",
+        "response     TEXT",
+        "created_at   REAL",
+    )
+
+    def __init__(self, path: Optional[str] = None, ttl: int = LLM_CACHE_TTL,
+                 max_bytes: int = LLM_CACHE_SIZE):
+        super().__init__(path, ttl, max_bytes)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._select(key, "response, created_at")
+            if row is None or now - row[1] >= self.ttl:
+                self.stats["misses"] += 1
+                return None
+            self._used(key, now)
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        self._store(key, (model, response, time.time()), len(response.encode("utf-8")))
+
+    def summary(self) -> Dict:
+        out = super().summary()
+        lookups = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else 0.0
+        return out
+
+
+# process-wide cache, opened on first use; None when disabled via ROTTWEILER_LLM_CACHE=0
+get_llm_cache = shared_cache(LLMCache, LLM_CACHE_ON)
@@ -1,7 +1,14 @@
 import os
+import time
+import queue
+import random
 import warnings
 import logging
-from typing import List, Dict, Optional
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Dict, Optional, Tuple
+
+from llm_cache import get_llm_cache, response_key
 
 warnings.filterwarnings("ignore")
 
@@ -44,6 +51,29 @@ DEFAULT_MODEL_NAMES = list(DEFAULT_MODELS.keys())
 ADVANCED_MODEL_NAMES = list(ADVANCED_MODELS.keys())
 ALL_MODEL_NAMES = list(MODEL_REGISTRY.keys())
 
+BRIEF_SITES    = 20                                                             # online sites the intel brief reads
+BRIEF_EARLY_AT = int(os.getenv("ROTTWEILER_BRIEF_EARLY_AT", str(BRIEF_SITES)))  # online sites that start it mid-scrape
+ANALYSIS_SITES = 40                                                             # sites a custom analysis reads in one prompt
+REPORT_SITES   = 30                                                             # sites a full report reads in one prompt
+
+# map-reduce: site lists past those caps are summarised in batches, then merged
+MAP_REDUCE       = os.getenv("ROTTWEILER_MAP_REDUCE", "1") != "0"
+MAP_CHUNK_TOKENS = int(os.getenv("ROTTWEILER_MAP_CHUNK_TOKENS", "6000"))   # prompt budget per batch
+MAP_WORKERS      = int(os.getenv("ROTTWEILER_MAP_WORKERS", "4"))           # batches in flight
+MAP_MAX_CHUNKS   = int(os.getenv("ROTTWEILER_MAP_MAX_CHUNKS", "12"))       # batches per request, the rest is dropped
+MAP_SITE_CHARS   = 1200    # scraped content per site in a batch
+MAP_NOTE_TOKENS  = 600     # output budget per batch
+
+MAP_PROMPT = """
+You are a dark web OSINT analyst working through one batch of a larger result set for: "{query}".
+Your notes will be merged with other batches into a single report. Extract:
+- Notable sites: URL, what it is, why it matters (one line each)
+- Threat categories and services seen
+- IOCs verbatim (onion URLs, emails, wallets, handles, hashes, PGP fingerprints)
+- Links between sites (shared operators, mirrors, cross-references)
+Be terse and factual. No preamble, no conclusions, skip sites with nothing of note.
+"""
+
 PROMPTS = {
     
     "intel_brief": """
@@ -748,13 +778,106 @@ Communication Plan:
 
 # PER-PROVIDER API WRAPPERS
 
-def _call_anthropic(model: str, system: str, user: str, max_tokens: int = 1200) -> str:
+PROVIDER_KEY_ENV = {
+    "anthropic":   "ANTHROPIC_API_KEY",
+    "openai":      "OPENAI_API_KEY",
+    "google":      "GOOGLE_API_KEY",
+    "groq":        "GROQ_API_KEY",
+    "openrouter":  "OPENROUTER_API_KEY",
+}
+
+PROVIDER_BASE_URLS = {
+    "openrouter":  "https://openrouter.ai/api/v1",
+}
+
+# completions in flight per provider across the whole process (map batches included)
+PROVIDER_CONCURRENCY = {
+    "anthropic":   4,
+    "openai":      4,
+    "google":      2,
+    "groq":        2,
+    "openrouter":  3,
+}
+_PROVIDER_SLOTS = {p: threading.BoundedSemaphore(n) for p, n in PROVIDER_CONCURRENCY.items()}
+
+RATE_LIMIT_RETRIES  = 4      # retries after a 429 before giving up
+RATE_LIMIT_BACKOFF  = 2.0    # seconds, doubled per retry unless the API sends retry-after
+RATE_LIMIT_MAX_WAIT = 30.0   # seconds
+
+
+class LLMError(Exception):
+    """A completion could not be produced; str() is the text shown in place of it."""
+
+
+def _rate_limited(e: Exception) -> bool:
+    # anthropic/openai/groq raise RateLimitError with status_code 429; Gemini raises ResourceExhausted
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    return status == 429 or type(e).__name__ in ("RateLimitError", "ResourceExhausted")
+
+
+def _backoff(e: Exception, attempt: int) -> float:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        wait = float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        wait = RATE_LIMIT_BACKOFF * 2 ** attempt * random.uniform(0.8, 1.2)
+    return min(wait, RATE_LIMIT_MAX_WAIT)
+
+
+def _build_client(provider: str, api_key: str, base_url: Optional[str]) -> Any:
+    if provider == "anthropic":
+        import anthropic
+        return anthropic.Anthropic(api_key=api_key)
+    if provider in ("openai", "openrouter"):
+        from openai import OpenAI
+        return OpenAI(api_key=api_key, base_url=base_url) if base_url else OpenAI(api_key=api_key)
+    if provider == "google":
+        # the Gemini SDK keeps its transport module-wide; configuring it is the "client"
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        return genai
+    if provider == "groq":
+        from groq import Groq
+        return Groq(api_key=api_key)
+    raise ValueError(f"Unknown provider: {provider}")
+
+
+class ProviderClients:
+    """
+    One SDK client per (provider, api key, base url), built on first use and
+    shared across calls and threads so HTTP connections and TLS sessions
+    survive between briefs. A rotated key replaces that provider's client.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, str, Optional[str]], Any] = {}
+        self._lock = threading.Lock()
+        self.stats = {"built": 0, "reused": 0}
+
+    def get(self, provider: str) -> Optional[Any]:
+        """The client for provider, or None when its API key isn't set."""
+        api_key = os.getenv(PROVIDER_KEY_ENV.get(provider, ""), "")
+        if not api_key:
+            return None
+        key = (provider, api_key, PROVIDER_BASE_URLS.get(provider))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.stats["reused"] += 1
+                return client
+            for old in [k for k in self._clients if k[0] == provider]:
+                del self._clients[old]
+            client = self._clients[key] = _build_client(provider, api_key, key[2])
+            self.stats["built"] += 1
+            return client
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+
+def _call_anthropic(client: Any, model: str, system: str, user: str, max_tokens: int = 1200) -> str:
     """Call Anthropic's API."""
-    import anthropic
-    api_key = os.getenv("ANTHROPIC_API_KEY", "")
-    if not api_key:
-        return "[ANTHROPIC_API_KEY not set]"
-    client = anthropic.Anthropic(api_key=api_key)
     msg = client.messages.create(
         model=model,
         max_tokens=max_tokens,
@@ -764,20 +887,8 @@ def _call_anthropic(model: str, system: str, user: str, max_tokens: int = 1200)
     return msg.content[0].text
 
 
-def _call_openai(
-    model: str,
-    system: str,
-    user: str,
-    max_tokens: int = 1200,
-    base_url: Optional[str] = None,
-    api_key_env: str = "OPENAI_API_KEY",
-) -> str:
-    """Call OpenAI's API (or OpenRouter if base_url provided)."""
-    from openai import OpenAI
-    api_key = os.getenv(api_key_env, "")
-    if not api_key:
-        return f"[{api_key_env} not set]"
-    client = OpenAI(api_key=api_key, base_url=base_url) if base_url else OpenAI(api_key=api_key)
+def _call_openai(client: Any, model: str, system: str, user: str, max_tokens: int = 1200) -> str:
+    """Call OpenAI's API (or OpenRouter, depending on the client's base_url)."""
     resp = client.chat.completions.create(
         model=model,
         max_tokens=max_tokens,
@@ -789,34 +900,193 @@ def _call_openai(
     return resp.choices[0].message.content
 
 
-def _call_google(model: str, system: str, user: str, max_tokens: int = 1200) -> str:
+def _call_google(genai: Any, model: str, system: str, user: str, max_tokens: int = 1200) -> str:
     """Call Google Gemini API."""
-    import google.generativeai as genai
-    api_key = os.getenv("GOOGLE_API_KEY", "")
-    if not api_key:
-        return "[GOOGLE_API_KEY not set]"
-    genai.configure(api_key=api_key)
     gemini = genai.GenerativeModel(model_name=model, system_instruction=system)
     resp = gemini.generate_content(user)
     return resp.text
 
 
-def _call_groq(model: str, system: str, user: str, max_tokens: int = 1200) -> str:
-    """Call Groq's API."""
-    from groq import Groq
-    api_key = os.getenv("GROQ_API_KEY", "")
-    if not api_key:
-        return "[GROQ_API_KEY not set]"
-    client = Groq(api_key=api_key)
-    resp = client.chat.completions.create(
+def _call_groq(client: Any, model: str, system: str, user: str, max_tokens: int = 1200) -> str:
+    """Call Groq's API (OpenAI-compatible chat completions)."""
+    return _call_openai(client, model, system, user, max_tokens)
+
+
+# STREAMING WRAPPERS — yield text deltas as the provider produces them
+
+def _stream_anthropic(client: Any, model: str, system: str, user: str, max_tokens: int = 1200) -> Iterator[str]:
+    with client.messages.stream(
+        model=model,
+        max_tokens=max_tokens,
+        system=system,
+        messages=[{"role": "user", "content": user}],
+    ) as stream:
+        for text in stream.text_stream:
+            yield text
+
+
+def _stream_openai(client: Any, model: str, system: str, user: str, max_tokens: int = 1200) -> Iterator[str]:
+    """OpenAI, OpenRouter and Groq all speak the same streaming chat-completions API."""
+    stream = client.chat.completions.create(
         model=model,
         max_tokens=max_tokens,
         messages=[
             {"role": "system", "content": system},
             {"role": "user",   "content": user},
         ],
+        stream=True,
     )
-    return resp.choices[0].message.content
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _stream_google(genai: Any, model: str, system: str, user: str, max_tokens: int = 1200) -> Iterator[str]:
+    gemini = genai.GenerativeModel(model_name=model, system_instruction=system)
+    for chunk in gemini.generate_content(user, stream=True):
+        if chunk.text:
+            yield chunk.text
+
+
+_PROVIDER_STREAMS = {
+    "anthropic":   _stream_anthropic,
+    "openai":      _stream_openai,
+    "google":      _stream_google,
+    "groq":        _stream_openai,
+    "openrouter":  _stream_openai,
+}
+
+_PROVIDER_CALLS = {
+    "anthropic":   _call_anthropic,
+    "openai":      _call_openai,
+    "google":      _call_google,
+    "groq":        _call_groq,
+    "openrouter":  _call_openai,
+}
+
+
+_STREAM_DONE = object()
+
+
+def _estimate_tokens(text: str) -> int:
+    # ~4 characters per token holds well enough for English and URLs across these models
+    return len(text) // 4 + 1
+
+
+def _site_block(s: Dict, content_chars: int) -> str:
+    content_preview = s.get("content", "")[:content_chars].replace("\n", " ")
+    return (
+        f"URL: {s.get('url','')}\n"
+        f"  Title: {s.get('title','N/A')}\n"
+        f"  Status: {s.get('status','unknown')}\n"
+        f"  Tags: {', '.join(s.get('tags', []))}\n"
+        f"  Content: {content_preview or 'N/A'}"
+    )
+
+
+_MAP_EXECUTOR = ThreadPoolExecutor(max_workers=MAP_WORKERS, thread_name_prefix="llm-map")
+
+
+class SiteMapper:
+    """
+    Map stage of map-reduce summarisation. Sites are packed into batches of
+    at most MAP_CHUNK_TOKENS prompt tokens; each full batch goes to the
+    worker pool as soon as it fills, so feeding sites while they are still
+    being scraped overlaps the two. notes() waits for every batch and
+    returns the text the reduce prompt is built from.
+    """
+
+    def __init__(self, llm: "ClaudeAI", query: str, budget: int = MAP_CHUNK_TOKENS):
+        self.llm = llm
+        self.query = query
+        self.budget = budget
+        self.sites = 0
+        self.dropped = 0
+        self._chunk: List[str] = []
+        self._chunk_tokens = 0
+        self._futures: List[Future] = []
+
+    def add(self, site: Dict):
+        block = _site_block(site, MAP_SITE_CHARS)
+        tokens = _estimate_tokens(block)
+        if self._chunk and self._chunk_tokens + tokens > self.budget:
+            self._submit()
+        if len(self._futures) >= MAP_MAX_CHUNKS:
+            self.dropped += 1
+            return
+        self._chunk.append(block)
+        self._chunk_tokens += tokens
+        self.sites += 1
+
+    def batches(self) -> int:
+        return len(self._futures) + bool(self._chunk)
+
+    def _submit(self):
+        system = MAP_PROMPT.replace("{query}", self.query)
+        user = f"Batch {len(self._futures) + 1}, {len(self._chunk)} sites:\n\n" + "\n\n".join(self._chunk)
+        self._futures.append(_MAP_EXECUTOR.submit(self.llm._complete, system, user, MAP_NOTE_TOKENS))
+        self._chunk, self._chunk_tokens = [], 0
+
+    def notes(self, on_progress: Optional[Callable[[int, int], None]] = None,
+              lead: str = "", lead_sites: int = 0) -> Optional[str]:
+        """
+        Batch notes joined for the reduce prompt; None when every batch
+        failed. on_progress(done, total) is called from the calling thread
+        as batches finish. lead is text already written about lead_sites
+        other sites (an early brief) and goes in front of the batches.
+        """
+        if self._chunk:
+            self._submit()
+        if self.dropped:
+            print(f"[LLM] map-reduce: {self.dropped} sites past {MAP_MAX_CHUNKS} batches left out")
+        total = len(self._futures)
+        done = []
+        for i, future in enumerate(self._futures):
+            try:
+                done.append((i, future.result()))
+            except LLMError as e:
+                print(f"[LLM] map batch {i + 1} failed: {e}")
+            if on_progress is not None:
+                on_progress(i + 1, total)
+        if not done:
+            return None
+        sections = [f"--- Brief on the first {lead_sites} sites ---\n{lead}"] if lead else []
+        sections += [f"--- Batch {i + 1} ---\n{text}" for i, text in done]
+        return (
+            f"Analyst notes on {self.sites + lead_sites} discovered sites, written in {len(sections)} parts:\n\n"
+            + "\n\n".join(sections)
+        )
+
+
+def stream_in_background(chunks: Iterator[str]) -> Iterator[str]:
+    """
+    Starts draining a chunk iterator on a daemon thread right away and
+    returns an iterator over what it produced. Chunks that arrived while the
+    caller was busy elsewhere come out at once; an exception in the source
+    is re-raised to the consumer.
+    """
+    buffer: "queue.Queue[Any]" = queue.Queue()
+
+    def drain():
+        try:
+            for chunk in chunks:
+                buffer.put(chunk)
+        except Exception as e:
+            buffer.put(e)
+        buffer.put(_STREAM_DONE)
+
+    threading.Thread(target=drain, name="llm-stream", daemon=True).start()
+
+    def replay() -> Iterator[str]:
+        while True:
+            item = buffer.get()
+            if item is _STREAM_DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    return replay()
 
 
 
@@ -831,6 +1101,9 @@ class ClaudeAI:
     - Custom model IDs (for power users)
     """
 
+    # shared by every instance: one client per provider/key for the whole process
+    clients = ProviderClients()
+
     def __init__(self, model_name: str = "Claude Sonnet 4 (Anthropic)"):
         self.set_model(model_name)
 
@@ -872,82 +1145,172 @@ class ClaudeAI:
         self.model_id = cfg["model"]
 
     #Internal dispatcher
-    def _call(self, system: str, user: str, max_tokens: int = 1200) -> str:
+    def _call(self, system: str, user: str, max_tokens: int = 1200, use_cache: bool = True) -> str:
         try:
-            if self.provider == "anthropic":
-                return _call_anthropic(self.model_id, system, user, max_tokens)
-
-            elif self.provider == "openai":
-                return _call_openai(self.model_id, system, user, max_tokens)
-
-            elif self.provider == "google":
-                return _call_google(self.model_id, system, user, max_tokens)
-
-            elif self.provider == "groq":
-                return _call_groq(self.model_id, system, user, max_tokens)
-
-            elif self.provider == "openrouter":
-                return _call_openai(
-                    self.model_id, system, user, max_tokens,
-                    base_url="https://openrouter.ai/api/v1",
-                    api_key_env="OPENROUTER_API_KEY",
-                )
-            else:
-                return f"[Unknown provider: {self.provider}]"
+            return self._complete(system, user, max_tokens, use_cache)
+        except LLMError as e:
+            return f"[{e}]"
+
+    def _complete(self, system: str, user: str, max_tokens: int = 1200, use_cache: bool = True) -> str:
+        """_call that raises LLMError instead of returning the error as text."""
+        call = _PROVIDER_CALLS.get(self.provider)
+        if call is None:
+            raise LLMError(f"Unknown provider: {self.provider}")
+
+        # identical requests (same model, prompts and budget) are answered from disk
+        cache = get_llm_cache() if use_cache else None
+        key = response_key(self.provider, self.model_id, system, user, max_tokens) if cache else ""
+        if cache:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
 
+        try:
+            client = self.clients.get(self.provider)
         except Exception as e:
-            return f"[{self.model_name} API error: {e}]"
+            raise LLMError(f"{self.model_name} API error: {e}")
+        if client is None:
+            raise LLMError(f"{PROVIDER_KEY_ENV[self.provider]} not set")
 
+        slot = _PROVIDER_SLOTS[self.provider]
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            try:
+                with slot:
+                    text = call(client, self.model_id, system, user, max_tokens)
+                break
+            except Exception as e:
+                if attempt < RATE_LIMIT_RETRIES and _rate_limited(e):
+                    wait = _backoff(e, attempt)
+                    print(f"[LLM] {self.provider} rate-limited, retry {attempt + 1} in {wait:.1f}s")
+                    time.sleep(wait)
+                    continue
+                raise LLMError(f"{self.model_name} API error: {e}")
+
+        if cache and text:
+            cache.put(key, f"{self.provider}:{self.model_id}", text)
+        return text
+
+    def _stream(self, system: str, user: str, max_tokens: int = 1200, use_cache: bool = True) -> Iterator[str]:
+        """Like _call, but yields the completion in chunks as they arrive."""
+        stream = _PROVIDER_STREAMS.get(self.provider)
+        if stream is None:
+            yield f"[Unknown provider: {self.provider}]"
+            return
+
+        cache = get_llm_cache() if use_cache else None
+        key = response_key(self.provider, self.model_id, system, user, max_tokens) if cache else ""
+        if cache:
+            cached = cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        parts: List[str] = []
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            try:
+                client = self.clients.get(self.provider)
+                if client is None:
+                    yield f"[{PROVIDER_KEY_ENV[self.provider]} not set]"
+                    return
+                # the slot is held while the answer streams, like any other completion in flight
+                with _PROVIDER_SLOTS[self.provider]:
+                    for chunk in stream(client, self.model_id, system, user, max_tokens):
+                        parts.append(chunk)
+                        yield chunk
+                break
 
-    def summarize_results(self, query: str, sites: List[Dict],
-                          preset: str = "intel_brief") -> str:
+            except Exception as e:
+                # a 429 can only be retried before anything has been shown
+                if not parts and attempt < RATE_LIMIT_RETRIES and _rate_limited(e):
+                    wait = _backoff(e, attempt)
+                    print(f"[LLM] {self.provider} rate-limited, retry {attempt + 1} in {wait:.1f}s")
+                    time.sleep(wait)
+                    continue
+                prefix = "\n" if parts else ""
+                yield f"{prefix}[{self.model_name} API error: {e}]"
+                return
+
+        # only a stream read to the end is a complete answer worth caching
+        text = "".join(parts)
+        if cache and text:
+            cache.put(key, f"{self.provider}:{self.model_id}", text)
+
+
+    def map_notes(self, query: str, sites: List[Dict], cap: int,
+                  on_progress: Optional[Callable[[int, int], None]] = None) -> Optional[str]:
         """
-        Generate an intelligence brief from discovered sites.
-        preset: one of the PROMPTS keys — defaults to 'intel_brief' (short terminal summary).
+        Map stage for site lists longer than a prompt's cap (BRIEF_SITES,
+        ANALYSIS_SITES or REPORT_SITES). None when they fit in one prompt,
+        map-reduce is off, or every batch failed — the prompt then falls back
+        to the first cap sites. Run it before a *_stream call and pass the
+        result as notes, so the wait can show progress instead of blocking
+        inside the call.
         """
+        if not MAP_REDUCE or len(sites) <= cap:
+            return None
+        mapper = SiteMapper(self, query)
+        for s in sites:
+            mapper.add(s)
+        print(f"[LLM] map-reduce: {len(sites)} sites in {mapper.batches()} batches")
+        return mapper.notes(on_progress)
+
+    def _summary_prompt(self, query: str, sites: List[Dict], preset: str,
+                        notes: Optional[str] = None) -> Tuple[str, str]:
         system = PROMPTS.get(preset, PROMPTS["intel_brief"])
         system = system.replace("{query}", query)
 
-        site_lines = []
-        for s in sites[:20]:
-            content_preview = s.get("content", "")[:350].replace("\n", " ")
-            line = (
-                f"URL: {s.get('url','')}\n"
-                f"  Title: {s.get('title','N/A')}\n"
-                f"  Status: {s.get('status','unknown')}\n"
-                f"  Tags: {', '.join(s.get('tags', []))}\n"
-                f"  Content: {content_preview or 'N/A'}"
-            )
-            site_lines.append(line)
+        notes = notes or self.map_notes(query, sites, BRIEF_SITES)
+        if notes:
+            return system, f"Query: '{query}'\n\n{notes}"
 
+        site_lines = [_site_block(s, 350) for s in sites[:BRIEF_SITES]]
         user = f"Query: '{query}'\n\nDiscovered sites:\n\n" + "\n\n".join(site_lines)
-        return self._call(system, user, max_tokens=800)
+        return system, user
 
-    def analyze_sites(self, prompt: str, sites: List[Dict],
-                      preset: str = "threat_intel") -> str:
+    def summarize_results(self, query: str, sites: List[Dict],
+                          preset: str = "intel_brief", notes: Optional[str] = None) -> str:
         """
-        Custom analyst query over all tracked sites.
-        preset controls which CTI framework to apply.
+        Generate an intelligence brief from discovered sites.
+        preset: one of the PROMPTS keys — defaults to 'intel_brief' (short terminal summary).
+        notes: SiteMapper.notes() already gathered for these sites; skips the map stage.
         """
+        system, user = self._summary_prompt(query, sites, preset, notes)
+        return self._call(system, user, max_tokens=800)
+
+    def summarize_results_stream(self, query: str, sites: List[Dict],
+                                 preset: str = "intel_brief", notes: Optional[str] = None) -> Iterator[str]:
+        """summarize_results, yielded in chunks as the model writes it."""
+        system, user = self._summary_prompt(query, sites, preset, notes)
+        return self._stream(system, user, max_tokens=800)
+
+    def _analysis_prompt(self, prompt: str, sites: List[Dict], preset: str,
+                         notes: Optional[str] = None) -> Tuple[str, str]:
         system = PROMPTS.get(preset, PROMPTS["threat_intel"])
         query  = prompt
         system = system.replace("{query}", query)
 
-        site_lines = []
-        for s in sites[:40]:
-            content_preview = s.get("content", "")[:400].replace("\n", " ")
-            line = (
-                f"URL: {s.get('url','')}\n"
-                f"  Title: {s.get('title','N/A')}\n"
-                f"  Status: {s.get('status','unknown')}\n"
-                f"  Tags: {', '.join(s.get('tags', []))}\n"
-                f"  Content: {content_preview or 'N/A'}"
-            )
-            site_lines.append(line)
+        notes = notes or self.map_notes(prompt, sites, ANALYSIS_SITES)
+        if notes:
+            return system, f"Analyst request: {prompt}\n\n{notes}"
 
+        site_lines = [_site_block(s, 400) for s in sites[:ANALYSIS_SITES]]
         user = f"Analyst request: {prompt}\n\nTracked sites:\n\n" + "\n\n".join(site_lines)
+        return system, user
+
+    def analyze_sites(self, prompt: str, sites: List[Dict],
+                      preset: str = "threat_intel", notes: Optional[str] = None) -> str:
+        """
+        Custom analyst query over all tracked sites.
+        preset controls which CTI framework to apply.
+        """
+        system, user = self._analysis_prompt(prompt, sites, preset, notes)
         return self._call(system, user, max_tokens=1200)
 
+    def analyze_sites_stream(self, prompt: str, sites: List[Dict],
+                             preset: str = "threat_intel", notes: Optional[str] = None) -> Iterator[str]:
+        system, user = self._analysis_prompt(prompt, sites, preset, notes)
+        return self._stream(system, user, max_tokens=1200)
+
     def analyze_single_site(self, site: Dict, preset: str = "threat_intel") -> str:
         """Deep analysis of a single site using scraped content."""
         system = (
@@ -968,21 +1331,19 @@ class ClaudeAI:
         )
         return self._call(system, user, max_tokens=900)
 
-    def generate_report(self, query: str, sites: List[Dict],
-                        preset: str = "threat_intel",
-                        custom_instructions: str = "") -> str:
-        """
-        Full structured CTI report.
-        preset: 'threat_intel' | 'ransomware_malware' | 'personal_identity' | 'corporate_espionage'
-        custom_instructions: appended to the system prompt for focused analysis.
-        """
+    def _report_prompt(self, query: str, sites: List[Dict], preset: str,
+                       custom_instructions: str, notes: Optional[str] = None) -> Tuple[str, str]:
         system = PROMPTS.get(preset, PROMPTS["threat_intel"])
         system = system.replace("{query}", query)
         if custom_instructions and custom_instructions.strip():
             system = system.rstrip() + f"\n\nAdditionally focus on: {custom_instructions.strip()}"
 
+        notes = notes or self.map_notes(query, sites, REPORT_SITES)
+        if notes:
+            return system, f"Query: {query}\n\nOSINT Data:\n\n{notes}"
+
         content_parts = []
-        for s in sites[:30]:
+        for s in sites[:REPORT_SITES]:
             content_preview = s.get("content", "")[:500].replace("\n", " ")
             part = (
                 f"[{s.get('status','?').upper()}] {s.get('url','')}\n"
@@ -993,19 +1354,29 @@ class ClaudeAI:
 
         content_block = "\n---\n".join(content_parts)
         user = f"Query: {query}\n\nOSINT Data:\n\n{content_block}"
+        return system, user
+
+    def generate_report(self, query: str, sites: List[Dict],
+                        preset: str = "threat_intel",
+                        custom_instructions: str = "", notes: Optional[str] = None) -> str:
+        """
+        Full structured CTI report.
+        preset: 'threat_intel' | 'ransomware_malware' | 'personal_identity' | 'corporate_espionage'
+        custom_instructions: appended to the system prompt for focused analysis.
+        """
+        system, user = self._report_prompt(query, sites, preset, custom_instructions, notes)
         return self._call(system, user, max_tokens=1500)
 
+    def generate_report_stream(self, query: str, sites: List[Dict],
+                               preset: str = "threat_intel",
+                               custom_instructions: str = "", notes: Optional[str] = None) -> Iterator[str]:
+        system, user = self._report_prompt(query, sites, preset, custom_instructions, notes)
+        return self._stream(system, user, max_tokens=1500)
+
     # Provider health check 
     def check_api_key(self) -> tuple[bool, str]:
         """Returns (is_configured: bool, message: str) for the active provider."""
-        env_map = {
-            "anthropic":   "ANTHROPIC_API_KEY",
-            "openai":      "OPENAI_API_KEY",
-            "google":      "GOOGLE_API_KEY",
-            "groq":        "GROQ_API_KEY",
-            "openrouter":  "OPENROUTER_API_KEY",
-        }
-        env_var = env_map.get(self.provider, "")
+        env_var = PROVIDER_KEY_ENV.get(self.provider, "")
         is_set  = bool(os.getenv(env_var, ""))
         if is_set:
             return True, f"{self.model_name} — configured ✓"
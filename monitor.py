@@ -1,26 +1,178 @@
+import os
+import json
 import time
+import random
 import requests
 import threading
-from datetime import datetime
-from typing import List
+from datetime import datetime, timezone
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional
 
-TOR_PROXY = {
-    "http": "socks5h://127.0.0.1:9050",
-    "https": "socks5h://127.0.0.1:9050",
-}
+from check_store import CheckStore
+from tor_pool import TorSessionPool, isolation_key
 
 REQUEST_TIMEOUT = 60 
+CHECK_WORKERS   = 20   # concurrent checks per sweep
+MONITOR_FILE    = os.getenv("ROTTWEILER_MONITOR_FILE", "")   # legacy watchlist to import once; the repo's sample is never picked up
+SCHEDULER_TICK  = 5     # seconds between due-site scans
+INTERVAL_JITTER = 0.1   # ± fraction of interval added to each next check
+COMPACT_EVERY   = 3600  # seconds between rollup / retention passes
+FOUND_MAX       = int(os.getenv("ROTTWEILER_WATCH_FOUND_MAX", "200"))            # hunt-found sites kept tracked, least recently found out first
+FOUND_TTL       = int(os.getenv("ROTTWEILER_WATCH_FOUND_DAYS", "14")) * 86400    # untrack hunt-found sites no hunt has seen for this long
+
+_POOL = TorSessionPool("monitor", retries=0)
+
+
+def scrape_checks(sites: List[Dict]) -> List[Dict]:
+    """
+    Scraped site records as record_results() input. Pages that actually went
+    over Tor count as checks; cache hits don't. response_time is
+    time-to-headers, which is what check_site measures too.
+    """
+    return [
+        {"url": s["url"], "status": s["status"], "status_code": s.get("status_code"),
+         "response_time": s["ttfb_ms"], "ttfb_ms": s["ttfb_ms"], "bytes": s.get("bytes", 0)}
+        for s in sites if s.get("ttfb_ms")
+    ]
 
 
 class SiteMonitor:
-    def __init__(self):
+    def __init__(self, path: str = MONITOR_FILE, store: Optional[CheckStore] = None):
         self.interval = 900  # 15 min default
         self._log: List[str] = []
         self._lock = threading.Lock()
-        self._running = True
+        self._running = False
+
+        self.path = path
+        self.store = store or CheckStore()
+        if path:
+            self.store.import_json(path)
+        self._data_lock = threading.Lock()
+        self._sites: Dict[str, Dict] = self._load()
+        self._next_due: Dict[str, float] = {}
+        self._compacted_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
 
     def set_interval(self, seconds: int):
         self.interval = seconds
+        # pull anything scheduled further out than the new interval back in
+        with self._data_lock:
+            latest = time.time() + self._jittered(seconds)
+            for url, due in self._next_due.items():
+                self._next_due[url] = min(due, latest)
+
+    # WATCHLIST
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            return self.store.get_sites()
+        except Exception as e:
+            print(f"[MONITOR] could not read {self.store.path}: {e}")
+            return {}
+
+    def add_site(self, url: str, title: str = "", tags: Optional[List[str]] = None, found: bool = False):
+        """found marks a site a hunt turned up; those age out, see prune_found()."""
+        with self._data_lock:
+            site = self._sites.get(url)
+            if site is None:
+                site = self._sites[url] = {
+                    "url":        url,
+                    "title":      title or url,
+                    "tags":       [],
+                    "added_at":   datetime.now(timezone.utc).isoformat(),
+                    "found_at":   time.time() if found else None,
+                    "last_check": None,
+                }
+            elif found and site.get("found_at") is not None:
+                site["found_at"] = time.time()
+            for tag in tags or []:
+                if tag and tag not in site["tags"]:
+                    site["tags"].append(tag)
+            self.store.upsert_site(url, site["title"], site["tags"], site["added_at"], site.get("found_at"))
+
+    def add_found(self, sites: List[Dict]):
+        """Tracks the online sites of a hunt, then trims the hunt-found part of the watchlist."""
+        for site in sites:
+            self.add_site(site["url"], site["title"], site["tags"], found=True)
+        self.prune_found()
+
+    def remove_site(self, url: str):
+        with self._data_lock:
+            if self._sites.pop(url, None) is not None:
+                self._next_due.pop(url, None)
+                self.store.remove_site(url)
+
+    def _found(self) -> List[str]:
+        # caller holds _data_lock; most recently found first
+        found = [(site["found_at"], url) for url, site in self._sites.items() if site.get("found_at") is not None]
+        return [url for _, url in sorted(found, reverse=True)]
+
+    def prune_found(self, now: Optional[float] = None) -> int:
+        """
+        Untracks hunt-found sites past FOUND_MAX or not found again within
+        FOUND_TTL. Sites tracked by hand are never touched.
+        """
+        now = time.time() if now is None else now
+        with self._data_lock:
+            found = self._found()
+            stale = [url for i, url in enumerate(found)
+                     if i >= FOUND_MAX or now - self._sites[url]["found_at"] > FOUND_TTL]
+        for url in stale:
+            self.remove_site(url)
+        if stale:
+            self._log_entry(f"UNTRACKED  {len(stale)} hunt-found sites")
+        return len(stale)
+
+    def untrack_found(self) -> int:
+        """Drops every hunt-found site from the watchlist."""
+        with self._data_lock:
+            found = self._found()
+        for url in found:
+            self.remove_site(url)
+        return len(found)
+
+    def get_sites(self) -> Dict[str, Dict]:
+        """Tracked sites with their latest check; history comes from get_history()."""
+        with self._data_lock:
+            return json.loads(json.dumps(self._sites))
+
+    def get_history(self, url: str, since: Optional[float] = None, until: Optional[float] = None) -> List[Dict]:
+        """Raw checks only — older history lives in the rollups, see get_buckets()/uptime()."""
+        return self.store.get_checks(url, since, until)
+
+    def history_version(self, url: str) -> float:
+        """Changes whenever the site gets a new check — a cheap cache key for rendered history."""
+        with self._data_lock:
+            site = self._sites.get(url)
+            return self._last_check_ts(site) if site else 0.0
+
+    def get_buckets(self, url: str, days: int = 7) -> List[Dict]:
+        return self.store.get_buckets(url, time.time() - days * 86400)
+
+    def uptime(self, url: str, days: int = 7) -> Dict:
+        return self.store.uptime(url, time.time() - days * 86400)
+
+    def record_results(self, results: List[dict]):
+        """Append one check per result to the tracked sites, in a single insert."""
+        now = time.time()
+        rows = []
+        with self._data_lock:
+            for r in results:
+                site = self._sites.get(r["url"])
+                if site is None:
+                    continue
+                check = {
+                    "time":          datetime.fromtimestamp(now, tz=timezone.utc).isoformat(),
+                    "ts":            now,
+                    "status":        r.get("status", "unknown"),
+                    "status_code":   r.get("status_code"),
+                    "response_time": r.get("response_time", 0) or 0,
+                }
+                site["last_check"] = check
+                rows.append((r["url"], now, check["status"], check["status_code"], check["response_time"],
+                             r.get("ttfb_ms"), r.get("bytes")))
+        self.store.insert_checks(rows)
 
     def _log_entry(self, msg: str):
         ts = datetime.utcnow().strftime("%H:%M:%S")
@@ -34,29 +186,31 @@ class SiteMonitor:
         with self._lock:
             return list(self._log)
 
-    def check_site(self, url: str) -> dict:
+    def check_site(self, url: str, timeout: float = REQUEST_TIMEOUT) -> dict:
         if not url.startswith("http"):
             check_url = f"http://{url}"
         else:
             check_url = url
 
-        start = time.time()
+        start = time.monotonic()
         try:
-            resp = requests.get(
+            # only the status line matters — don't pull the body over Tor
+            resp = _POOL.session(isolation_key(check_url)).get(
                 check_url,
-                proxies=TOR_PROXY,
-                timeout=REQUEST_TIMEOUT,
+                timeout=timeout,
                 headers={"User-Agent": "Mozilla/5.0"},
                 allow_redirects=True,
+                stream=True,
             )
-            elapsed = int((time.time() - start) * 1000)
+            resp.close()
+            elapsed = int((time.monotonic() - start) * 1000)
             
             if resp.status_code < 500:
                 self._log_entry(f"✓ ONLINE  {url[:50]}  ({elapsed}ms)")
-                return {"status": "online", "response_time": elapsed}
+                return {"status": "online", "status_code": resp.status_code, "response_time": elapsed, "ttfb_ms": elapsed}
             else:
                 self._log_entry(f"✗ HTTP{resp.status_code}  {url[:50]}")
-                return {"status": "offline", "response_time": 0}
+                return {"status": "offline", "status_code": resp.status_code, "response_time": 0}
                 
         except requests.exceptions.ConnectTimeout:
             self._log_entry(f"✗ TIMEOUT  {url[:50]}")
@@ -75,10 +229,140 @@ class SiteMonitor:
             self._log_entry(f"✗ ERROR  {url[:40]}  {str(e)[:40]}")
             return {"status": "offline", "response_time": 0}
 
-    def check_multiple(self, urls: List[str]) -> List[dict]:
+    def check_stream(
+        self,
+        urls: List[str],
+        max_workers: int = CHECK_WORKERS,
+        deadline: float = REQUEST_TIMEOUT,
+    ) -> Iterator[dict]:
+        """
+        Checks up to max_workers sites at once and yields each result as it
+        completes. A check still running deadline seconds after it started is
+        reported offline and abandoned, so one hung onion can't stall a sweep.
+        """
+        pending_urls = list(reversed(urls))
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="monitor-check")
+        running: Dict = {}       # future -> (url, started)
+        abandoned: set = set()   # past deadline but still holding a worker thread
+
+        def fill():
+            abandoned.difference_update([f for f in abandoned if f.done()])
+            while pending_urls and len(running) + len(abandoned) < max_workers:
+                url = pending_urls.pop()
+                running[executor.submit(self.check_site, url, deadline)] = (url, time.monotonic())
+
+        try:
+            fill()
+            while running or pending_urls:
+                if running:
+                    oldest = min(started for _, started in running.values())
+                    wait_for = max(0.0, oldest + deadline - time.monotonic())
+                    done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+                else:
+                    # every slot is held by an abandoned check — wait for one to free up
+                    done = set()
+                    wait(abandoned, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    url, _ = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {"status": "offline", "response_time": 0, "error": str(e)[:60]}
+                    result["url"] = url
+                    yield result
+
+                now = time.monotonic()
+                for future, (url, started) in list(running.items()):
+                    if now - started >= deadline:
+                        running.pop(future)
+                        abandoned.add(future)
+                        self._log_entry(f"✗ DEADLINE  {url[:50]}")
+                        yield {"url": url, "status": "offline", "response_time": 0, "error": "deadline exceeded"}
+                fill()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def check_multiple(
+        self,
+        urls: List[str],
+        max_workers: int = CHECK_WORKERS,
+        deadline: float = REQUEST_TIMEOUT,
+    ) -> List[dict]:
+        by_url = {r["url"]: r for r in self.check_stream(urls, max_workers=max_workers, deadline=deadline)}
+        return [by_url[url] for url in urls]
+
+    # SCHEDULER
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * (1 + random.uniform(-INTERVAL_JITTER, INTERVAL_JITTER))
+
+    def _last_check_ts(self, site: Dict) -> float:
+        last = site.get("last_check")
+        return last["ts"] if last else 0.0
+
+    def due_sites(self, now: Optional[float] = None) -> List[str]:
+        now = time.time() if now is None else now
+        with self._data_lock:
+            for url, site in self._sites.items():
+                if url not in self._next_due:
+                    last = self._last_check_ts(site)
+                    due = last + self._jittered(self.interval)
+                    if due <= now:
+                        # overdue on first sight: stagger the backlog instead of checking it all in one tick
+                        due = now + random.uniform(0, min(self.interval, SCHEDULER_TICK * len(self._sites) / 20))
+                    self._next_due[url] = due
+            return [url for url, due in self._next_due.items() if due <= now and url in self._sites]
+
+    def run_due_checks(self) -> int:
+        due = self.due_sites()
+        if not due:
+            return 0
+
+        with self._data_lock:
+            # reschedule up front so a slow sweep doesn't get the same sites queued twice
+            for url in due:
+                self._next_due[url] = time.time() + self._jittered(self.interval)
+
         results = []
-        for url in urls:
-            result = self.check_site(url)
-            result['url'] = url
+        for result in self.check_stream(due):
+            if self._stop.is_set():
+                break
             results.append(result)
-        return results
+        self.record_results(results)
+        self._log_entry(f"SWEEP  {len(results)}/{len(due)} sites checked")
+        return len(results)
+
+    def _loop(self):
+        self._log_entry(f"SCHEDULER STARTED  every {self.interval}s")
+        while not self._stop.is_set():
+            try:
+                self.run_due_checks()
+                if time.time() - self._compacted_at >= COMPACT_EVERY:
+                    self._compacted_at = time.time()
+                    self.prune_found()
+                    self.store.compact()
+            except Exception as e:
+                self._log_entry(f"✗ SCHEDULER  {str(e)[:60]}")
+            self._stop.wait(SCHEDULER_TICK)
+        self._log_entry("SCHEDULER STOPPED")
+
+    def start(self):
+        """Starts the background scheduler; a no-op if it is already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="site-monitor", daemon=True)
+            self._running = True
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self._running = False
+
+    def is_running(self) -> bool:
+        return self._running and self._thread is not None and self._thread.is_alive()
@@ -0,0 +1,82 @@
+import os
+import time
+from typing import Dict, Optional
+
+from disk_cache import DiskCache, shared_cache
+
+PAGE_CACHE_ON   = os.getenv("ROTTWEILER_PAGE_CACHE", "1") != "0"
+PAGE_CACHE_TTL  = int(os.getenv("ROTTWEILER_PAGE_CACHE_TTL", str(6 * 3600)))     # seconds
+PAGE_CACHE_SIZE = int(os.getenv("ROTTWEILER_PAGE_CACHE_MB", "64")) * 1024 * 1024  # bytes
+
+
+class PageCache(DiskCache):
+    """
+    On-disk cache of scraped pages, keyed by normalised URL.
+
+    Fresh entries (younger than ttl) are served without touching Tor. Stale
+    entries keep their ETag / Last-Modified so the scraper can revalidate
+    with a conditional GET and re-use the stored text on a 304. The store is
+    capped at max_bytes of content; least-recently-used pages go first.
+    """
+
+    TABLE = "pages"
+    FILENAME = "pages.sqlite3"
+    COLUMNS = (
+        "title         TEXT",
+        "content       TEXT",
+        "status        TEXT",
+        "status_code   INTEGER",
+        "etag          TEXT",
+        "last_modified TEXT",
+        "fetched_at    REAL",
+    )
+    STATS = ("hits", "revalidated", "misses", "stores", "evictions")
+
+    def __init__(self, path: Optional[str] = None, ttl: int = PAGE_CACHE_TTL,
+                 max_bytes: int = PAGE_CACHE_SIZE):
+        super().__init__(path, ttl, max_bytes)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Returns the entry with a 'fresh' flag, or None."""
+        with self._lock:
+            row = self._select(key, "title, content, status, status_code, etag, last_modified, fetched_at")
+            if row is None:
+                return None
+            self._used(key, time.time())
+
+        title, content, status, status_code, etag, last_modified, fetched_at = row
+        fresh = (time.time() - fetched_at) < self.ttl
+        return {
+            "title":         title,
+            "content":       content,
+            "status":        status,
+            "status_code":   status_code,
+            "etag":          etag,
+            "last_modified": last_modified,
+            "fresh":         fresh,
+        }
+
+    def hit(self, revalidated: bool = False):
+        with self._lock:
+            self.stats["revalidated" if revalidated else "hits"] += 1
+
+    def miss(self):
+        with self._lock:
+            self.stats["misses"] += 1
+
+    def touch(self, key: str):
+        """A 304 came back — the stored copy is good for another ttl."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+            self._db.commit()
+
+    def put(self, key: str, data: Dict):
+        content = data.get("content", "") or ""
+        size = len(content.encode("utf-8")) + len(data.get("title", "") or "")
+        self._store(key, (data.get("title"), content, data.get("status"), data.get("status_code"),
+                          data.get("etag"), data.get("last_modified"), time.time()), size)
+
+
+# process-wide cache, opened on first use; None when disabled via ROTTWEILER_PAGE_CACHE=0
+get_page_cache = shared_cache(PageCache, PAGE_CACHE_ON)
@@ -1,11 +1,24 @@
 
 from tor_search import get_search_results
-from catching import scrape_multiple
+from monitor import scrape_checks
+from catching import get_parse_pool, scrape_multiple
+from tor_control import wait_for_tor
 from datetime import datetime
 
 
 def run_discovery(query: str, monitor, llm, max_results: int = 50) -> dict:
     print(f"\n[PIPELINE] Searching for: {query}")
+    # same gate as the app: a fresh container starts Tor alongside us
+    ready = wait_for_tor(on_progress=lambda progress, summary: print(f"[PIPELINE] Tor bootstrap {progress}% — {summary}"))
+    if ready is False:
+        return {
+            "discovered":  0,
+            "active":      0,
+            "all_sites":   [],
+            "active_sites":[],
+            "summary":     "Tor is still bootstrapping. Try again in a minute.",
+        }
+
     search_results = get_search_results(query, max_workers=10)
     search_results = search_results[:max_results]
     print(f"[PIPELINE] Search returned {len(search_results)} unique links")
@@ -20,7 +33,7 @@ def run_discovery(query: str, monitor, llm, max_results: int = 50) -> dict:
         }
 
     print(f"[PIPELINE] Scraping {len(search_results)} sites via Tor...")
-    scraped = scrape_multiple(search_results, max_workers=5)
+    scraped = scrape_multiple(search_results, max_workers=5, parse_pool=get_parse_pool())
 
     ts = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
     all_sites: list  = []
@@ -42,7 +55,9 @@ def run_discovery(query: str, monitor, llm, max_results: int = 50) -> dict:
             "content":       content,      
             "status":        status,
             "status_code":   http_code,
-            "response_time": 0,
+            "response_time": data.get("fetch_ms", 0),
+            "ttfb_ms":       data.get("ttfb_ms", 0),
+            "bytes":         data.get("bytes", 0),
             "discovered_at": ts,
             "query":         query,
             "tags":          [query],
@@ -55,9 +70,16 @@ def run_discovery(query: str, monitor, llm, max_results: int = 50) -> dict:
 
     print(f"[PIPELINE] Online: {len(active_sites)} / Total: {len(all_sites)}")
 
+    # hand the online sites to the monitor so its scheduler keeps checking them
+    if monitor:
+        monitor.add_found(active_sites)
+        # the scrape itself is the first timed check
+        monitor.record_results(scrape_checks(active_sites))
+
     # summary
     summary = ""
-    sites_for_ai = active_sites[:20] if active_sites else all_sites[:20]
+    # the LLM map-reduces lists longer than its prompt cap
+    sites_for_ai = active_sites if active_sites else all_sites[:20]
     if sites_for_ai and llm:
         try:
             summary = llm.summarize_results(query, sites_for_ai)
@@ -0,0 +1,84 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+SEARCH_CACHE_TTL     = int(os.getenv("ROTTWEILER_SEARCH_CACHE_TTL", str(30 * 60)))       # served as-is
+SEARCH_CACHE_STALE   = int(os.getenv("ROTTWEILER_SEARCH_CACHE_STALE", str(6 * 3600)))    # served, then refreshed
+SEARCH_CACHE_ENTRIES = 2000
+
+
+class SearchCache:
+    """
+    In-process cache of per-engine search results, keyed by (engine, query).
+
+    fresh  (age < ttl)                 -> returned, no request
+    stale  (ttl <= age < stale_ttl)    -> returned immediately, caller refreshes in the background
+    miss   (absent or age >= stale_ttl)-> caller fetches and stores
+    """
+
+    def __init__(self, ttl: int = SEARCH_CACHE_TTL, stale_ttl: int = SEARCH_CACHE_STALE,
+                 max_entries: int = SEARCH_CACHE_ENTRIES):
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[Dict[str, str]]]]" = OrderedDict()
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+
+    @staticmethod
+    def key(engine_name: str, query: str) -> Tuple[str, str]:
+        return engine_name, " ".join(query.lower().split())
+
+    def lookup(self, engine_name: str, query: str) -> Tuple[Optional[List[Dict[str, str]]], str]:
+        k = self.key(engine_name, query)
+        with self._lock:
+            entry = self._entries.get(k)
+            age = time.time() - entry[0] if entry else None
+            if entry is None or age >= self.stale_ttl:
+                self.stats["misses"] += 1
+                return None, "miss"
+            self._entries.move_to_end(k)
+            if age < self.ttl:
+                self.stats["hits"] += 1
+                return [dict(r) for r in entry[1]], "fresh"
+            self.stats["stale_hits"] += 1
+            return [dict(r) for r in entry[1]], "stale"
+
+    def store(self, engine_name: str, query: str, results: List[Dict[str, str]]):
+        k = self.key(engine_name, query)
+        with self._lock:
+            self._entries[k] = (time.time(), [dict(r) for r in results])
+            self._entries.move_to_end(k)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def begin_refresh(self, engine_name: str, query: str) -> bool:
+        """Claims the background refresh for this key; False if one is already running."""
+        k = self.key(engine_name, query)
+        with self._lock:
+            if k in self._refreshing:
+                return False
+            self._refreshing.add(k)
+            self.stats["refreshes"] += 1
+            return True
+
+    def end_refresh(self, engine_name: str, query: str):
+        with self._lock:
+            self._refreshing.discard(self.key(engine_name, query))
+
+    def summary(self) -> Dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"]
+            served  = self.stats["hits"] + self.stats["stale_hits"]
+            return {
+                **self.stats,
+                "entries":  len(self._entries),
+                "hit_rate": round(served / lookups, 3) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,56 @@
+import json
+
+from check_store import CheckStore, TIERS, _floor, _to_iso
+
+URL = "http://example.onion"
+NOW = _floor(1_760_000_000, TIERS["daily"]) + 12 * 3600
+
+
+def _checks(start, n, status="online"):
+    return [(URL, start + i * 60, status, 200, 100 + i, None, None) for i in range(n)]
+
+
+def _store(tmp_path):
+    store = CheckStore(str(tmp_path / "checks.sqlite3"))
+    store.insert_checks(_checks(NOW - 3600, 10))
+    store.compact(NOW)
+    return store
+
+
+def test_backfilled_checks_are_rolled(tmp_path):
+    store = _store(tmp_path)
+    store.insert_checks(_checks(NOW - 2 * 86400, 20, "offline"))
+
+    assert store.uptime(URL, NOW - 3 * 86400, NOW)["checks"] == 30
+    store.compact(NOW + 2 * 86400)
+    stats = store.uptime(URL, NOW - 3 * 86400, NOW)
+    assert stats["checks"] == 30
+    assert stats["online"] == 10
+
+
+def test_import_into_live_db_is_rolled(tmp_path):
+    store = _store(tmp_path)
+    legacy = tmp_path / "monitor.json"
+    start = NOW - 2 * 86400
+    legacy.write_text(json.dumps({"sites": {URL: {"checks": [
+        {"time": _to_iso(start + i * 60), "status": "online", "status_code": 200, "response_time": 50}
+        for i in range(20)
+    ]}}}))
+    assert store.import_json(str(legacy)) == 20
+
+    store.compact(NOW + 2 * 86400)
+    stats = store.uptime(URL, NOW - 3 * 86400, NOW)
+    assert stats["checks"] == 30
+    assert stats["online"] == 30
+    assert stats["rt_min"] == 50
+
+
+def test_backfill_merges_when_raw_is_gone(tmp_path):
+    store = _store(tmp_path)
+    # same hour as the original checks, but their raw rows are trimmed by now
+    store.compact(NOW + 5 * 86400)
+    store.insert_checks(_checks(NOW - 3600 + 30, 5, "offline"))
+
+    stats = store.uptime(URL, NOW - 86400, NOW)
+    assert stats["checks"] == 15
+    assert stats["online"] == 10
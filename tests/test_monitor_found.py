@@ -0,0 +1,38 @@
+import monitor
+from check_store import CheckStore
+from monitor import SiteMonitor
+
+
+def _site(i):
+    return {"url": f"http://site{i}.onion", "title": f"site {i}", "tags": ["q"]}
+
+
+def _monitor(tmp_path):
+    return SiteMonitor(path="", store=CheckStore(str(tmp_path / "checks.sqlite3")))
+
+
+def test_found_sites_are_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(monitor, "FOUND_MAX", 3)
+    m = _monitor(tmp_path)
+    m.add_site("http://mine.onion", "mine")
+    for i in range(5):
+        m.add_found([_site(i)])
+
+    assert set(m.get_sites()) == {"http://mine.onion"} | {_site(i)["url"] for i in (2, 3, 4)}
+    # survives a restart
+    assert set(_monitor(tmp_path).get_sites()) == set(m.get_sites())
+
+
+def test_found_sites_age_out_and_clear(tmp_path):
+    m = _monitor(tmp_path)
+    m.add_site("http://mine.onion", "mine")
+    m.add_found([_site(0), _site(1)])
+    # a hand-tracked site found by a hunt stays hand-tracked
+    m.add_found([{"url": "http://mine.onion", "title": "mine", "tags": ["q"]}])
+
+    assert m.prune_found(now=m.get_sites()[_site(0)["url"]]["found_at"] + monitor.FOUND_TTL + 1) == 2
+    assert set(m.get_sites()) == {"http://mine.onion"}
+
+    m.add_found([_site(2)])
+    assert m.untrack_found() == 1
+    assert set(m.get_sites()) == {"http://mine.onion"}
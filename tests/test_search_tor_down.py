@@ -0,0 +1,27 @@
+import asyncio
+import socket
+
+import tor_pool
+import tor_search
+from tor_search import ENGINE_HEALTH, SEARCH_ENGINES, async_collect_search_results
+
+
+def _dead_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_tor_down_leaves_breakers_closed(monkeypatch):
+    # nothing listens on the SOCKS port: every engine fails to even reach Tor
+    monkeypatch.setattr(tor_pool, "SOCKS_PORTS", tor_pool.SocksPorts([_dead_port()]))
+    monkeypatch.setattr(tor_search, "_cached_results", lambda engine, query: None)
+    ENGINE_HEALTH.reset()
+
+    for i in range(3):
+        results = asyncio.run(async_collect_search_results(f"tor down {i}", deadline=5, hedge=False))
+        assert results == []
+
+    snapshot = ENGINE_HEALTH.snapshot()
+    assert all(h["state"] == "closed" for h in snapshot.values())
+    assert all(ENGINE_HEALTH.allow(engine["name"]) for engine in SEARCH_ENGINES)
@@ -1,6 +1,12 @@
+import html
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
-from datetime import datetime, timedelta
-from typing import Dict, List
+import numpy as np
 
 
 COLOUR = {
@@ -15,90 +21,195 @@ TOOLTIP_LABEL = {
     "unknown": "NO DATA",
 }
 
+OPACITY = {"online": 0.9, "offline": 0.9, "unknown": 0.25}
 
-def _slot_label(slot_index: int, total_slots: int, days: int) -> str:
-    now   = datetime.utcnow()
-    start = now - timedelta(days=days)
-    slot_duration = timedelta(days=days) / total_slots
-    slot_time = start + slot_duration * slot_index
-    return slot_time.strftime("%b %d %H:%M UTC")
+HTML_CACHE_ENTRIES = 2000
 
+# emitted once per page — see ui.render_hunt_results
+TIMELINE_CSS = (
+    "<style>"
+    "@keyframes pulse{0%,100%{opacity:1}50%{opacity:.35}}"
+    ".rw-bar{display:flex;align-items:stretch;width:100%;gap:0;}"
+    ".rw-cell{flex:1;height:22px;border-radius:2px;margin:0 1px;cursor:default;transition:opacity .15s;}"
+    ".rw-cell:hover{opacity:1 !important;}"
+    ".rw-axis{font-size:9px;color:#1e3a4a;font-family:Share Tech Mono,monospace;}"
+    "</style>"
+)
 
-def _generate_slots_from_site(site: Dict, slots: int = 30) -> List[str]:
-    status = site.get("status", "unknown")
-    slot_data = ["unknown"] * (slots - 1) + [status]
-    return slot_data
+_CELL = '<div class="rw-cell" title="{label} — {text}" style="background:{colour};opacity:{opacity};"></div>'
+
+_HTML_CACHE: "OrderedDict[tuple, str]" = OrderedDict()
+_HTML_LOCK = threading.Lock()
+
+
+def _slot_epoch(slots: int, days: int, now: Optional[float] = None) -> int:
+    """
+    Index of the slot holding `now` on a fixed grid of days*86400/slots
+    seconds. The bar ends where that slot does, so its slots (and any card
+    rendered from them) only change when the epoch rolls over.
+    """
+    now = time.time() if now is None else now
+    return int(now // (days * 86400 / slots))
+
+
+def _window_end(slots: int, days: int, epoch: int) -> float:
+    return (epoch + 1) * (days * 86400 / slots)
+
+
+@lru_cache(maxsize=32)
+def _slot_labels(slots: int, days: int, epoch: int) -> Tuple[str, ...]:
+    """Start time of every slot, computed once per (slots, days, epoch)."""
+    step = days * 86400 / slots
+    start = _window_end(slots, days, epoch) - days * 86400
+    return tuple(
+        datetime.fromtimestamp(start + step * i, tz=timezone.utc).strftime("%b %d %H:%M UTC")
+        for i in range(slots)
+    )
+
+
+def bucket_history(history: List[Dict], slots: int = 30, days: int = 7,
+                   now: Optional[float] = None) -> Tuple[List[str], Optional[float]]:
+    """
+    Buckets check history (raw checks or CheckStore rollup buckets, each with
+    an epoch 'ts') into `slots` equal windows ending now. A slot is online when
+    at least half its checks were; slots without checks are unknown. Returns
+    (per-slot status, uptime % over the whole window or None without data).
+    """
+    now = time.time() if now is None else now
+    start = now - days * 86400
+    n = len(history)
+    if not n:
+        return ["unknown"] * slots, None
+
+    ts     = np.fromiter((h["ts"] for h in history), dtype=np.float64, count=n)
+    checks = np.fromiter((h.get("checks", 1) for h in history), dtype=np.float64, count=n)
+    online = np.fromiter(
+        (h["online"] if "online" in h else h.get("status") == "online" for h in history),
+        dtype=np.float64, count=n,
+    )
+
+    keep = (ts >= start) & (ts < now)
+    edges = start + (days * 86400 / slots) * np.arange(1, slots)
+    idx = np.searchsorted(edges, ts[keep], side="right")
+    total = np.bincount(idx, weights=checks[keep], minlength=slots)
+    up    = np.bincount(idx, weights=online[keep], minlength=slots)
+
+    status = np.where(total == 0, "unknown", np.where(up * 2 >= total, "online", "offline"))
+    checked = total.sum()
+    return status.tolist(), (float(100 * up.sum() / checked) if checked else None)
 
 
-def uptime_bar_html(site: Dict, slots: int = 30, days: int = 7) -> str:
+def _generate_slots_from_site(site: Dict, slots: int = 30, days: int = 7,
+                              history: Optional[List[Dict]] = None,
+                              epoch: Optional[int] = None) -> Tuple[List[str], float]:
+    status = site.get("status", "unknown")
+    epoch = _slot_epoch(slots, days) if epoch is None else epoch
+    slot_data, uptime_pct = bucket_history(history or [], slots, days, _window_end(slots, days, epoch))
+    # the hunt's own result is the freshest data point we have
+    if slot_data[-1] == "unknown":
+        slot_data[-1] = status
+    if uptime_pct is None:
+        uptime_pct = 100 if status == "online" else 0
+    return slot_data, uptime_pct
+
+
+def uptime_bar_html(
+    site: Dict,
+    slots: int = 30,
+    days: int = 7,
+    history: Union[None, List[Dict], Callable[[], List[Dict]]] = None,
+    version: Optional[object] = None,
+) -> str:
+    """
+    One site's uptime card. Expects TIMELINE_CSS on the page. `history` may be
+    a callable so it is only loaded when the bar isn't memoised; pass a
+    `version` that changes whenever the site gets a new check to enable that.
+    The bar is memoised on (url, status, version) plus the slot epoch; the
+    rest of the card is a few cheap per-hunt fields and is built each call.
+    """
     if not site:
         return ""
 
-    url          = site.get("url", "")
-    status       = site.get("status", "unknown")
-    resp_time    = site.get("response_time", 0)
-    discovered_at = site.get("discovered_at", "—")
-    query        = site.get("query", "")
-    uptime_pct   = 100 if status == "online" else 0
+    epoch = _slot_epoch(slots, days)
+    key = None
+    bar = None
+    if version is not None:
+        key = (site.get("url", ""), site.get("status", "unknown"), version, slots, days, epoch)
+        with _HTML_LOCK:
+            bar = _HTML_CACHE.get(key)
+            if bar is not None:
+                _HTML_CACHE.move_to_end(key)
+
+    if bar is None:
+        if callable(history):
+            history = history()
+        bar = _render_bar(site, slots, days, history, epoch)
+        if key is not None:
+            with _HTML_LOCK:
+                _HTML_CACHE[key] = bar
+                while len(_HTML_CACHE) > HTML_CACHE_ENTRIES:
+                    _HTML_CACHE.popitem(last=False)
+    return _render(site, days, *bar)
+
+
+def _render_bar(site: Dict, slots: int, days: int, history: Optional[List[Dict]],
+                epoch: int) -> Tuple[float, str]:
+    """(uptime %, slot cells HTML) — the part worth memoising."""
+    slot_data, uptime_pct = _generate_slots_from_site(site, slots, days, history, epoch)
+    labels = _slot_labels(slots, days, epoch)
+    bar_cells = "".join(
+        _CELL.format(label=labels[i], text=TOOLTIP_LABEL[s], colour=COLOUR[s], opacity=OPACITY[s])
+        for i, s in enumerate(slot_data)
+    )
+    return uptime_pct, bar_cells
 
-    slot_data = _generate_slots_from_site(site, slots)
+
+def _render(site: Dict, days: int, uptime_pct: float, bar_cells: str) -> str:
+    url           = site.get("url", "")
+    status        = site.get("status", "unknown")
+    resp_time     = site.get("response_time", 0)
+    discovered_at = site.get("discovered_at", "—")
+    query         = site.get("query", "")
 
     badge_colour = COLOUR.get(status, COLOUR["unknown"])
     badge_text   = status.upper()
     pulse_anim   = "animation:pulse 2s infinite;" if status == "online" else ""
 
-    bar_cells = ""
-    for i, s in enumerate(slot_data):
-        colour  = COLOUR[s]
-        tooltip = f"{_slot_label(i, slots, days)} — {TOOLTIP_LABEL[s]}"
-        opacity = 0.9 if s != "unknown" else 0.25
-        bar_cells += (
-            f'<div title="{tooltip}" style="'
-            f'flex:1;height:22px;background:{colour};'
-            f'border-radius:2px;margin:0 1px;cursor:default;'
-            f'opacity:{opacity};transition:opacity .15s;" '
-            f'onmouseover="this.style.opacity=1" '
-            f'onmouseout="this.style.opacity={opacity}">'
-            f'</div>'
-        )
-
     tag_html = ""
     if query:
         tag_html = (
             f'<span style="background:rgba(0,255,170,.07);border:1px solid rgba(0,255,170,.18);'
             f'color:#00ffaa;font-size:10px;padding:1px 7px;margin:0 2px;letter-spacing:1px;'
-            f'text-transform:uppercase;">{query}</span>'
+            f'text-transform:uppercase;">{html.escape(query)}</span>'
         )
 
-    import html as _html
-    safe_url          = _html.escape(url)
-    safe_discovered   = _html.escape(discovered_at)
-    resp_time_html    = f'<span style="font-size:11px;color:#1a4a3a;">{resp_time}ms</span>' if resp_time else ""
-
-    return (
-        '<style>@keyframes pulse{0%,100%{opacity:1}50%{opacity:.35}}</style>'
-        + f'<div style="background:#07080f;border:1px solid #0d3347;border-left:3px solid {badge_colour};padding:14px 18px 10px;margin:6px 0;font-family:\'Share Tech Mono\',monospace;">'
-        + f'<div style="display:flex;align-items:center;justify-content:space-between;flex-wrap:wrap;gap:8px;">'
-        + f'<div style="display:flex;align-items:center;gap:10px;">'
-        + f'<span style="width:9px;height:9px;border-radius:50%;background:{badge_colour};display:inline-block;flex-shrink:0;{pulse_anim}"></span>'
-        + f'<span style="color:#e0eaf5;font-size:13px;word-break:break-all;">{safe_url}</span>'
-        + f'</div>'
-        + f'<div style="display:flex;align-items:center;gap:14px;flex-shrink:0;">'
-        + f'<span style="font-size:11px;color:{badge_colour};letter-spacing:1px;">{badge_text}</span>'
-        + f'<span style="font-size:11px;color:#2a6a5a;">↑ {uptime_pct:.0f}% uptime</span>'
-        + resp_time_html
-        + f'</div>'
-        + f'</div>'
-        + f'<div style="margin:6px 0 10px;">{tag_html}</div>'
-        + f'<div style="margin-bottom:3px;"><span style="font-size:9px;color:#1e3a4a;letter-spacing:2px;">7-DAY UPTIME HISTORY</span></div>'
-        + f'<div style="display:flex;align-items:stretch;width:100%;gap:0;">{bar_cells}</div>'
-        + f'<div style="display:flex;width:100%;margin-top:3px;">'
-        + f'<span style="font-size:9px;color:#1e3a4a;font-family:Share Tech Mono,monospace;">← 7 days ago</span>'
-        + f'<span style="flex:1;"></span>'
-        + f'<span style="font-size:9px;color:#1e3a4a;font-family:Share Tech Mono,monospace;">now →</span>'
-        + f'</div>'
-        + f'<div style="display:flex;gap:20px;margin-top:8px;flex-wrap:wrap;">'
-        + f'<span style="font-size:10px;color:#1e3a4a;">DISCOVERED: <span style="color:#2a5a4a;">{safe_discovered}</span></span>'
-        + f'</div>'
-        + f'</div>'
-    )
+    safe_url        = html.escape(url)
+    safe_discovered = html.escape(discovered_at)
+    resp_time_html  = f'<span style="font-size:11px;color:#1a4a3a;">{resp_time}ms</span>' if resp_time else ""
+
+    return "".join([
+        f'<div style="background:#07080f;border:1px solid #0d3347;border-left:3px solid {badge_colour};padding:14px 18px 10px;margin:6px 0;font-family:\'Share Tech Mono\',monospace;">',
+        '<div style="display:flex;align-items:center;justify-content:space-between;flex-wrap:wrap;gap:8px;">',
+        '<div style="display:flex;align-items:center;gap:10px;">',
+        f'<span style="width:9px;height:9px;border-radius:50%;background:{badge_colour};display:inline-block;flex-shrink:0;{pulse_anim}"></span>',
+        f'<span style="color:#e0eaf5;font-size:13px;word-break:break-all;">{safe_url}</span>',
+        '</div>',
+        '<div style="display:flex;align-items:center;gap:14px;flex-shrink:0;">',
+        f'<span style="font-size:11px;color:{badge_colour};letter-spacing:1px;">{badge_text}</span>',
+        f'<span style="font-size:11px;color:#2a6a5a;">↑ {uptime_pct:.0f}% uptime</span>',
+        resp_time_html,
+        '</div>',
+        '</div>',
+        f'<div style="margin:6px 0 10px;">{tag_html}</div>',
+        f'<div style="margin-bottom:3px;"><span style="font-size:9px;color:#1e3a4a;letter-spacing:2px;">{days}-DAY UPTIME HISTORY</span></div>',
+        f'<div class="rw-bar">{bar_cells}</div>',
+        '<div style="display:flex;width:100%;margin-top:3px;">',
+        f'<span class="rw-axis">← {days} days ago</span>',
+        '<span style="flex:1;"></span>',
+        '<span class="rw-axis">now →</span>',
+        '</div>',
+        '<div style="display:flex;gap:20px;margin-top:8px;flex-wrap:wrap;">',
+        f'<span style="font-size:10px;color:#1e3a4a;">DISCOVERED: <span style="color:#2a5a4a;">{safe_discovered}</span></span>',
+        '</div>',
+        '</div>',
+    ])
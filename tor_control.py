@@ -0,0 +1,334 @@
+import os
+import time
+import queue
+import socket
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from stats import percentile
+
+CONTROL_HOST        = os.getenv("ROTTWEILER_TOR_CONTROL_HOST", "127.0.0.1")
+CONTROL_PORT        = int(os.getenv("ROTTWEILER_TOR_CONTROL_PORT", "9051"))
+CONTROL_CONFIGURED  = "ROTTWEILER_TOR_CONTROL_PORT" in os.environ   # set where torrc opens a ControlPort
+CONTROL_PASSWORD    = os.getenv("ROTTWEILER_TOR_CONTROL_PASSWORD", "")
+CONTROL_TIMEOUT     = 10     # seconds per command
+RECONNECT_EVERY     = 30     # seconds between attempts while the control port is down
+BOOTSTRAP_WAIT      = 120    # seconds a hunt waits for Tor to finish bootstrapping
+CONNECT_RETRY       = 2      # seconds between connects while a configured control port isn't up yet
+NEWNYM_WINDOW       = 30     # recent scrape outcomes considered
+NEWNYM_MIN_SAMPLES  = 10
+NEWNYM_FAILURE_RATE = 0.6    # failure share in the window that triggers NEWNYM
+NEWNYM_COOLDOWN     = 120    # seconds between NEWNYM signals
+
+
+class TorControlError(Exception):
+    """The control port refused a command or went away."""
+
+
+class TorController:
+    """
+    Minimal Tor control-protocol client (control-spec.txt) over a plain socket.
+
+    A reader thread splits the connection into command replies and async
+    CIRC events; the events time each circuit from LAUNCHED to BUILT.
+    """
+
+    def __init__(self, host: str = CONTROL_HOST, port: int = CONTROL_PORT, password: str = CONTROL_PASSWORD):
+        self.host = host
+        self.port = port
+        self.password = password
+        self._sock: Optional[socket.socket] = None
+        self._cmd_lock = threading.Lock()
+        self._replies: "queue.Queue[Tuple[str, List[str]]]" = queue.Queue()
+        self._state_lock = threading.Lock()
+        self._launched: Dict[str, float] = {}
+        self._build_times: Deque[float] = deque(maxlen=200)
+        self._circ_failed = 0
+        self._outcomes: Deque[bool] = deque(maxlen=NEWNYM_WINDOW)
+        self._last_newnym = 0.0
+        self.newnym_count = 0
+
+    # CONNECTION
+
+    def connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=CONTROL_TIMEOUT)
+        sock.settimeout(None)
+        self._sock = sock
+        self._replies = queue.Queue()
+        threading.Thread(target=self._read_loop, args=(sock, self._replies), name="tor-control", daemon=True).start()
+        self._authenticate()
+        self.command("SETEVENTS CIRC")
+        print(f"[TORCTL] connected to {self.host}:{self.port}")
+
+    def connected(self) -> bool:
+        return self._sock is not None
+
+    def close(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _authenticate(self):
+        info = " ".join(self.command("PROTOCOLINFO 1"))
+        methods = ""
+        cookie_file = ""
+        for part in info.split():
+            if part.startswith("METHODS="):
+                methods = part[len("METHODS="):]
+            elif part.startswith("COOKIEFILE="):
+                cookie_file = part[len("COOKIEFILE="):].strip('"')
+
+        if self.password and "HASHEDPASSWORD" in methods:
+            secret = '"' + self.password.replace("\\", "\\\\").replace('"', '\\"') + '"'
+        elif "COOKIE" in methods.split(",") and cookie_file:
+            with open(cookie_file, "rb") as f:
+                secret = f.read().hex()
+        elif "NULL" in methods:
+            secret = ""
+        else:
+            raise TorControlError(f"no usable auth method (offered: {methods or 'none'})")
+        self.command(f"AUTHENTICATE {secret}".strip())
+
+    def _read_loop(self, sock: socket.socket, replies: "queue.Queue[Tuple[str, List[str]]]"):
+        reader = sock.makefile("r", encoding="utf-8", errors="replace", newline="\r\n")
+        lines: List[str] = []
+        try:
+            for raw in reader:
+                line = raw.rstrip("\r\n")
+                code, sep, body = line[:3], line[3:4], line[4:]
+                if sep == "+":
+                    # multi-line data block, terminated by a lone "."
+                    data = [body]
+                    for raw_data in reader:
+                        data_line = raw_data.rstrip("\r\n")
+                        if data_line == ".":
+                            break
+                        data.append(data_line)
+                    lines.append("\n".join(data))
+                    continue
+                lines.append(body)
+                if sep != " ":
+                    continue
+                if code == "650":
+                    self._on_event(lines)
+                else:
+                    replies.put((code, lines))
+                lines = []
+        except (OSError, ValueError):
+            pass
+        finally:
+            if self._sock is sock:
+                self._sock = None
+            replies.put(("000", ["connection closed"]))
+
+    def command(self, line: str) -> List[str]:
+        """Sends one command and returns its reply lines; raises TorControlError unless it is a 250."""
+        with self._cmd_lock:
+            sock = self._sock
+            if sock is None:
+                raise TorControlError("not connected")
+            try:
+                sock.sendall((line + "\r\n").encode("utf-8"))
+                code, lines = self._replies.get(timeout=CONTROL_TIMEOUT)
+            except (OSError, queue.Empty) as e:
+                self.close()
+                raise TorControlError(f"{line.split()[0]}: {e or 'timed out'}")
+        if code != "250":
+            raise TorControlError(f"{line.split()[0]}: {code} {' '.join(lines)[:120]}")
+        return lines
+
+    def getinfo(self, key: str) -> str:
+        for line in self.command(f"GETINFO {key}"):
+            if line.startswith(f"{key}="):
+                return line[len(key) + 1:].lstrip("\n")
+        return ""
+
+    # EVENTS
+
+    def _on_event(self, lines: List[str]):
+        parts = lines[0].split()
+        if len(parts) < 3 or parts[0] != "CIRC":
+            return
+        circ_id, status = parts[1], parts[2]
+        now = time.monotonic()
+        with self._state_lock:
+            if status == "LAUNCHED":
+                self._launched[circ_id] = now
+            elif status == "BUILT":
+                started = self._launched.pop(circ_id, None)
+                if started is not None:
+                    self._build_times.append(now - started)
+            elif status in ("FAILED", "CLOSED"):
+                if self._launched.pop(circ_id, None) is not None and status == "FAILED":
+                    self._circ_failed += 1
+
+    # BOOTSTRAP
+
+    def bootstrap(self) -> Tuple[int, str]:
+        """(progress %, summary) from status/bootstrap-phase."""
+        phase = self.getinfo("status/bootstrap-phase")
+        progress, summary = 0, ""
+        for token in _split_keywords(phase):
+            if token.startswith("PROGRESS="):
+                progress = int(token[len("PROGRESS="):])
+            elif token.startswith("SUMMARY="):
+                summary = token[len("SUMMARY="):].strip('"')
+        return progress, summary
+
+    def wait_for_bootstrap(self, timeout: float = BOOTSTRAP_WAIT,
+                           on_progress: Optional[Callable[[int, str], None]] = None) -> bool:
+        deadline = time.monotonic() + timeout
+        last = -1
+        while True:
+            progress, summary = self.bootstrap()
+            if progress != last and on_progress is not None:
+                on_progress(progress, summary)
+            last = progress
+            if progress >= 100:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(1)
+
+    # CIRCUITS
+
+    def newnym(self, reason: str = "") -> bool:
+        """Asks Tor for fresh circuits for new streams; rate-limited by NEWNYM_COOLDOWN."""
+        with self._state_lock:
+            if time.monotonic() - self._last_newnym < NEWNYM_COOLDOWN:
+                return False
+            self._last_newnym = time.monotonic()
+        self.command("SIGNAL NEWNYM")
+        with self._state_lock:
+            self.newnym_count += 1
+            self._outcomes.clear()
+        print(f"[TORCTL] NEWNYM sent{' — ' + reason if reason else ''}")
+        return True
+
+    def report(self, ok: bool):
+        """Feeds one scrape outcome; a failure spike across the window triggers NEWNYM."""
+        with self._state_lock:
+            self._outcomes.append(ok)
+            n = len(self._outcomes)
+            failures = n - sum(self._outcomes)
+            spike = n >= NEWNYM_MIN_SAMPLES and failures / n >= NEWNYM_FAILURE_RATE
+        if spike:
+            try:
+                self.newnym(f"{failures}/{n} recent scrapes failed")
+            except TorControlError as e:
+                print(f"[TORCTL] NEWNYM failed: {e}")
+
+    def metrics(self) -> Dict:
+        circuits = [line for line in self.getinfo("circuit-status").splitlines() if line.strip()]
+        streams = [line for line in self.getinfo("stream-status").splitlines() if line.strip()]
+        progress, summary = self.bootstrap()
+        with self._state_lock:
+            builds = list(self._build_times)
+            outcomes = list(self._outcomes)
+            failed = self._circ_failed
+        return {
+            "bootstrap":      progress,
+            "summary":        summary,
+            "circuits":       len(circuits),
+            "circuits_built": sum(1 for c in circuits if " BUILT" in c),
+            "streams":        len(streams),
+            "build_p50":      round(percentile(builds, 50), 2),
+            "build_p95":      round(percentile(builds, 95), 2),
+            "build_samples":  len(builds),
+            "build_failed":   failed,
+            "scrape_fail":    round(1 - sum(outcomes) / len(outcomes), 3) if outcomes else 0.0,
+            "newnym":         self.newnym_count,
+        }
+
+
+def _split_keywords(line: str) -> List[str]:
+    """Splits 'A=1 B="x y"' on spaces outside quotes."""
+    out, buf, quoted = [], [], False
+    for ch in line:
+        if ch == '"':
+            quoted = not quoted
+        if ch == " " and not quoted:
+            if buf:
+                out.append("".join(buf))
+            buf = []
+        else:
+            buf.append(ch)
+    if buf:
+        out.append("".join(buf))
+    return out
+
+
+_CONTROLLER: Optional[TorController] = None
+_CONTROLLER_LOCK = threading.Lock()
+_LAST_ATTEMPT = 0.0
+
+
+def get_tor_controller(force: bool = False) -> Optional[TorController]:
+    """
+    Shared controller, (re)connected on demand. None while the control port
+    is unreachable; attempts are spaced RECONNECT_EVERY apart unless force.
+    """
+    global _CONTROLLER, _LAST_ATTEMPT
+    with _CONTROLLER_LOCK:
+        if _CONTROLLER is not None and _CONTROLLER.connected():
+            return _CONTROLLER
+        if not force and time.monotonic() - _LAST_ATTEMPT < RECONNECT_EVERY and _LAST_ATTEMPT:
+            return None
+        _LAST_ATTEMPT = time.monotonic()
+        controller = _CONTROLLER or TorController()
+        try:
+            controller.connect()
+        except (OSError, TorControlError) as e:
+            controller.close()
+            print(f"[TORCTL] control port unavailable: {str(e)[:80]}")
+            return None
+        _CONTROLLER = controller
+        return controller
+
+
+def wait_for_tor(timeout: float = BOOTSTRAP_WAIT,
+                 on_progress: Optional[Callable[[int, str], None]] = None) -> Optional[bool]:
+    """
+    Blocks until Tor reports 100% bootstrap. True when ready, False on
+    timeout, None when there is no control port to ask (callers go ahead).
+    A fresh container opens the control port a moment after the app starts,
+    so with CONTROL_CONFIGURED the connect is retried until the timeout
+    before giving up on it.
+    """
+    deadline = time.monotonic() + timeout
+    controller = get_tor_controller()
+    if controller is None and CONTROL_CONFIGURED:
+        if on_progress is not None:
+            on_progress(0, "waiting for the control port")
+        while controller is None and time.monotonic() < deadline:
+            time.sleep(CONNECT_RETRY)
+            controller = get_tor_controller(force=True)
+    if controller is None:
+        return None
+    try:
+        return controller.wait_for_bootstrap(max(0.0, deadline - time.monotonic()), on_progress)
+    except TorControlError as e:
+        print(f"[TORCTL] bootstrap check failed: {e}")
+        return None
+
+
+def report_scrape(ok: bool):
+    # called from scrape threads — never blocks on a reconnect, the hunt gate or settings tab does that
+    controller = _CONTROLLER
+    if controller is not None and controller.connected():
+        controller.report(ok)
+
+
+def tor_metrics() -> Optional[Dict]:
+    controller = get_tor_controller()
+    if controller is None:
+        return None
+    try:
+        return controller.metrics()
+    except TorControlError as e:
+        print(f"[TORCTL] metrics failed: {e}")
+        return None
@@ -0,0 +1,220 @@
+import os
+import hashlib
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urlparse
+from typing import Dict, List, Optional
+
+TOR_HOST          = os.getenv("ROTTWEILER_TOR_HOST", "127.0.0.1")
+TOR_PORTS         = [int(p) for p in os.getenv("ROTTWEILER_TOR_PORTS", "9050").split(",") if p.strip()]
+PORT_POLICY       = os.getenv("ROTTWEILER_TOR_PORT_POLICY", "round_robin")   # round_robin | least_loaded
+ISOLATION         = os.getenv("ROTTWEILER_TOR_ISOLATION", "target")          # target | pool | none
+ISOLATION_BUCKETS = int(os.getenv("ROTTWEILER_TOR_ISOLATION_BUCKETS", "32"))  # credential sets targets hash into
+STICKY_KEYS       = 1024   # isolation keys SocksPorts remembers a port for
+
+TOR_PROXY = {
+    "http":  f"socks5h://{TOR_HOST}:{TOR_PORTS[0]}",
+    "https": f"socks5h://{TOR_HOST}:{TOR_PORTS[0]}",
+}
+
+_POOLS: List["TorSessionPool"] = []
+
+
+class SocksPorts:
+    """
+    The SOCKS ports (one Tor instance each, or several SocksPorts of one
+    instance) that traffic is spread over. round_robin pins each isolation
+    key to a port on first use so its keep-alive connections stay put;
+    least_loaded picks the port with the fewest requests in flight.
+    """
+
+    def __init__(self, ports: List[int] = TOR_PORTS, policy: str = PORT_POLICY):
+        self.ports = list(ports) or [9050]
+        self.policy = policy
+        self._inflight = {p: 0 for p in self.ports}
+        self._sent = {p: 0 for p in self.ports}
+        self._sticky: Dict[str, int] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def pick(self, key: Optional[str] = None) -> int:
+        with self._lock:
+            if len(self.ports) == 1:
+                return self.ports[0]
+            if self.policy == "least_loaded":
+                return min(self.ports, key=lambda p: (self._inflight[p], self._sent[p]))
+            if key is not None and key in self._sticky:
+                return self._sticky[key]
+            port = self.ports[self._next % len(self.ports)]
+            self._next += 1
+            if key is not None:
+                self._sticky[key] = port
+                if len(self._sticky) > STICKY_KEYS:
+                    del self._sticky[next(iter(self._sticky))]
+            return port
+
+    def begin(self, port: int):
+        with self._lock:
+            if port in self._inflight:
+                self._inflight[port] += 1
+                self._sent[port] += 1
+
+    def end(self, port: int):
+        with self._lock:
+            if port in self._inflight:
+                self._inflight[port] -= 1
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            return [{"port": p, "inflight": self._inflight[p], "sent": self._sent[p]} for p in self.ports]
+
+
+SOCKS_PORTS = SocksPorts()
+
+
+def isolation_key(url: str) -> str:
+    """Per-target isolation key: the host, so every onion / engine gets its own circuit."""
+    return urlparse(url if "://" in url else f"http://{url}").hostname or url
+
+
+def isolation_bucket(key: str) -> str:
+    """
+    Folds an isolation key into one of ISOLATION_BUCKETS credential sets.
+    requests' adapter keeps a SOCKS proxy manager (with its own idle
+    keep-alive pools) per proxy URL and never drops one, so one URL per onion
+    host would grow without bound across hunts; buckets keep targets on
+    separate circuits at 1/ISOLATION_BUCKETS odds of sharing one.
+    """
+    digest = hashlib.sha1(key.encode("utf-8")).digest()
+    return f"bucket-{int.from_bytes(digest[:8], 'big') % ISOLATION_BUCKETS}"
+
+
+def proxy_url(key: Optional[str] = None, scheme: str = "socks5h", port: Optional[int] = None) -> str:
+    """
+    SOCKS URL for one isolation key. Tor's IsolateSOCKSAuth (on by default)
+    never shares a circuit between different username/password pairs, so the
+    key becomes the credentials.
+    """
+    port = SOCKS_PORTS.pick(key) if port is None else port
+    if not key:
+        return f"{scheme}://{TOR_HOST}:{port}"
+    user = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return f"{scheme}://{user}:x@{TOR_HOST}:{port}"
+
+
+class _TorAdapter(HTTPAdapter):
+    """Counts requests in flight per SOCKS port for least_loaded selection."""
+
+    def send(self, request, proxies=None, **kwargs):
+        proxy = (proxies or {}).get(urlparse(request.url).scheme)
+        port = urlparse(proxy).port if proxy else None
+        if port is not None:
+            SOCKS_PORTS.begin(port)
+        try:
+            return super().send(request, proxies=proxies, **kwargs)
+        finally:
+            if port is not None:
+                SOCKS_PORTS.end(port)
+
+
+class TorSessionPool:
+    """
+    Keep-alive session layer over Tor.
+
+    Every thread gets its own requests.Session, but all of them mount the same
+    HTTPAdapter, so the underlying urllib3 connection pools (and the SOCKS
+    streams behind them) are shared across threads and survive between hunts.
+
+    session(isolate=...) points the session at the proxy for that isolation
+    key's bucket (see isolation_bucket, proxy_url); the adapter keeps one
+    connection pool per proxy URL, so at most buckets x ports of them.
+    With isolation "pool" every request of this pool shares one key, with
+    "none" no credentials are sent at all.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        retries: int = 2,
+        backoff_factor: float = 0.3,
+        pool_connections: int = 50,
+        pool_maxsize: int = 10,
+        isolation: str = ISOLATION,
+    ):
+        self.name = name
+        self.isolation = isolation
+        retry = Retry(
+            total=retries,
+            read=retries,
+            connect=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[500, 502, 503, 504],
+            raise_on_status=False,
+        )
+        self._adapter = _TorAdapter(
+            max_retries=retry,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+        )
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sessions_created = 0
+        _POOLS.append(self)
+
+    def session(self, isolate: Optional[str] = None) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://",  self._adapter)
+            session.mount("https://", self._adapter)
+            self._local.session = session
+            with self._lock:
+                self._sessions_created += 1
+
+        # sessions are per thread, so re-pointing the proxy here can't race another request
+        if self.isolation == "none":
+            key = None
+        elif self.isolation == "pool" or isolate is None:
+            key = self.name
+        else:
+            key = isolation_bucket(isolate)
+        proxy = proxy_url(key)
+        session.proxies = {"http": proxy, "https": proxy}
+        return session
+
+    def stats(self) -> Dict:
+        # urllib3 pools count every connection they open and every request they send;
+        # the difference is requests that rode an already-open connection
+        connections = 0
+        requests_sent = 0
+        managers = [self._adapter.poolmanager, *self._adapter.proxy_manager.values()]
+        for manager in managers:
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is None:
+                    continue
+                connections += pool.num_connections
+                requests_sent += pool.num_requests
+
+        reused = max(0, requests_sent - connections)
+        return {
+            "pool":        self.name,
+            "sessions":    self._sessions_created,
+            "connections": connections,
+            "requests":    requests_sent,
+            "reused":      reused,
+            "reuse_ratio": round(reused / requests_sent, 3) if requests_sent else 0.0,
+        }
+
+    def close(self):
+        self._adapter.close()
+
+
+def pool_stats() -> List[Dict]:
+    return [p.stats() for p in _POOLS]
+
+
+def port_stats() -> List[Dict]:
+    return SOCKS_PORTS.stats()
@@ -1,41 +1,42 @@
 
+import os
+import asyncio
+import time
+import threading
 import requests
 import random
 import re
 import urllib.parse
 import warnings
 
-from typing import List, Dict, Set
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from bs4 import BeautifulSoup
+import httpx
+
+from typing import Callable, List, Dict, Optional, Set
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from rank_bm25 import BM25Okapi
 
+from engine_health import CircuitOpenError, HealthRegistry, HedgeBudget
+from extract import get_extractor
+from search_cache import SearchCache
+from tor_pool import TorSessionPool, isolation_key, proxy_url
+
 warnings.filterwarnings("ignore")
 
-def get_tor_session() -> requests.Session:
-    session = requests.Session()
+ENGINE_TIMEOUT   = 40                          # seconds per engine
+TOR_SOCKS_SCHEME = "socks5"   # httpx resolves .onion hosts through the proxy either way
 
-    retry = Retry(
-        total=3,
-        read=3,
-        connect=3,
-        backoff_factor=0.5,
-        status_forcelist=[500, 502, 503, 504],
-    )
+# one retry: the engine health tracker, not urllib3 backoff, decides when to give up on an engine
+_POOL = TorSessionPool("search", retries=1, backoff_factor=0.5)
 
-    adapter = HTTPAdapter(max_retries=retry)
+ENGINE_HEALTH = HealthRegistry(default_timeout=ENGINE_TIMEOUT)
 
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
+# hedging: if an engine is slower than its p50, race a second request on a fresh circuit
+HEDGE_ENABLED = os.getenv("ROTTWEILER_SEARCH_HEDGE", "0") == "1"
+HEDGE_BUDGET  = HedgeBudget()
 
-    session.proxies = {
-        "http": "socks5h://127.0.0.1:9050",
-        "https": "socks5h://127.0.0.1:9050",
-    }
 
-    return session
+def get_tor_session(isolate: Optional[str] = None) -> requests.Session:
+    return _POOL.session(isolate)
 
 
 USER_AGENTS = [
@@ -56,7 +57,6 @@ def get_headers() -> Dict[str, str]:
         "User-Agent": random.choice(USER_AGENTS),
         "Accept-Language": "en-US,en;q=0.9",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        "Connection": "close",
     }
 
 # SEARCH ENGINE LIST
@@ -138,60 +138,180 @@ def _normalise(url: str) -> str:
         return url
 
 
-def fetch_search_results(engine: Dict, query: str) -> List[Dict[str, str]]:
-    name     = engine["name"]
-    endpoint = engine["url"].format(query=urllib.parse.quote_plus(query))
-    headers  = get_headers()
-    session  = get_tor_session()
+def _parse_engine_results(name: str, html: str) -> List[Dict[str, str]]:
+    links = []
+    seen_links: Set[str] = set()
 
-    try:
-        response = session.get(endpoint, headers=headers, timeout=40)
-        if response.status_code != 200:
-            print(f"[{name}] Non-200: {response.status_code}")
-            return []
+    for href, title in get_extractor().links(html):
+        try:
+            match = re.findall(r"https?://[a-z2-7A-Z0-9\.\-]+\.onion[^\s\"'<>]*", href)
+            if not match:
+                continue
+            raw_link = match[0]
 
-        soup  = BeautifulSoup(response.text, "html.parser")
-        links = []
-        seen_links: Set[str] = set()
+            if not _is_valid_result(raw_link, title):
+                continue
 
-        for a in soup.find_all("a", href=True):
-            try:
-                href  = a["href"]
-                title = a.get_text(strip=True)
+            clean = _normalise(raw_link)
+            if clean in seen_links:
+                continue
+            seen_links.add(clean)
 
-                match = re.findall(r"https?://[a-z2-7A-Z0-9\.\-]+\.onion[^\s\"'<>]*", href)
-                if not match:
-                    continue
-                raw_link = match[0]
+            links.append({"title": title or clean, "link": clean})
 
-                if not _is_valid_result(raw_link, title):
-                    continue
+        except Exception:
+            continue
 
-                clean = _normalise(raw_link)
-                if clean in seen_links:
-                    continue
-                seen_links.add(clean)
+    print(f"[{name}] found {len(links)} clean results")
+    return links
 
-                links.append({"title": title or clean, "link": clean})
 
-            except Exception:
-                continue
+def _fetch_engine(
+    engine: Dict,
+    query: str,
+    isolate: Optional[str] = None,
+    cancel: Optional[threading.Event] = None,
+    started: Optional[float] = None,
+) -> List[Dict[str, str]]:
+    name     = engine["name"]
+    endpoint = engine["url"].format(query=urllib.parse.quote_plus(query))
+    headers  = get_headers()
+    session  = get_tor_session(isolate or name)   # one circuit per engine
+
+    if not ENGINE_HEALTH.allow(name):
+        raise CircuitOpenError(f"{name} circuit open")
+
+    timeout = ENGINE_HEALTH.timeout_for(name)
+    # a hedge reports latency from when the primary went out, which is what the caller waited
+    start   = time.monotonic() if started is None else started
+    try:
+        # with a cancel event the body is only read if the other hedge hasn't already won
+        response = session.get(endpoint, headers=headers, timeout=timeout, stream=cancel is not None)
+        if cancel is not None and cancel.is_set():
+            response.close()
+            return []
+        if response.status_code != 200:
+            print(f"[{name}] Non-200: {response.status_code}")
+            ENGINE_HEALTH.record(name, time.monotonic() - start, False, error=f"HTTP {response.status_code}")
+            return []
 
-        print(f"[{name}] found {len(links)} clean results")
-        return links
+        results = _parse_engine_results(name, response.text)
+        ENGINE_HEALTH.record(name, time.monotonic() - start, True, len(results))
+        return results
 
+    except requests.exceptions.Timeout:
+        print(f"[{name}] timed out after {timeout:.0f}s")
+        ENGINE_HEALTH.record(name, time.monotonic() - start, False, error="timeout", timed_out=True)
+        return []
     except requests.exceptions.ConnectionError as e:
         err = str(e)
         if "SOCKS" in err or "unreachable" in err.lower() or "refused" in err.lower():
+            # Tor itself is down — says nothing about the engine
             print(f"[{name}] Tor unreachable — skipping")
         else:
             print(f"[{name}] connection error: {err[:100]}")
+            ENGINE_HEALTH.record(name, time.monotonic() - start, False, error=err)
         return []
     except Exception as e:
         print(f"[{name}] error: {str(e)[:100]}")
+        ENGINE_HEALTH.record(name, time.monotonic() - start, False, error=str(e))
         return []
 
-def get_search_results(query: str, max_workers: int = 10) -> List[Dict[str, str]]:
+
+SEARCH_CACHE = SearchCache()
+_REFRESH_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="search-refresh")
+
+
+def _refresh_in_background(engine: Dict, query: str):
+    if not SEARCH_CACHE.begin_refresh(engine["name"], query):
+        return
+
+    def refresh():
+        try:
+            results = _fetch_engine(engine, query)
+            if results:
+                SEARCH_CACHE.store(engine["name"], query, results)
+        except CircuitOpenError:
+            pass
+        finally:
+            SEARCH_CACHE.end_refresh(engine["name"], query)
+
+    _REFRESH_EXECUTOR.submit(refresh)
+
+
+def _cached_results(engine: Dict, query: str) -> Optional[List[Dict[str, str]]]:
+    """Cached results for this engine/query (kicking off a refresh if stale), or None on a miss."""
+    results, state = SEARCH_CACHE.lookup(engine["name"], query)
+    if state == "stale":
+        _refresh_in_background(engine, query)
+    if results is not None:
+        print(f"[{engine['name']}] {len(results)} results from cache ({state})")
+    return results
+
+
+_HEDGE_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="search-hedge")
+
+
+def _fetch_hedged(engine: Dict, query: str) -> List[Dict[str, str]]:
+    """
+    Sends the request; if it hasn't answered by the engine's p50 and the
+    budget allows, races a second one on an isolated circuit. The first
+    non-empty answer wins and the loser drops its connection at the headers.
+    """
+    name = engine["name"]
+    HEDGE_BUDGET.earn()
+    delay = ENGINE_HEALTH.hedge_delay(name)
+    if delay is None:
+        return _fetch_engine(engine, query)
+
+    cancel  = threading.Event()
+    started = time.monotonic()
+    primary = _HEDGE_EXECUTOR.submit(_fetch_engine, engine, query, None, cancel, started)
+    done, _ = wait([primary], timeout=delay)
+    if done or not HEDGE_BUDGET.spend():
+        return primary.result()
+
+    print(f"[{name}] no answer after p50 {delay:.1f}s — hedging on a fresh circuit")
+    hedge   = _HEDGE_EXECUTOR.submit(_fetch_engine, engine, query, f"{name}#hedge", cancel, started)
+    running = {primary, hedge}
+    while running:
+        done, running = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                results = future.result()
+            except CircuitOpenError:
+                continue   # a half-open breaker lets only one of the two through
+            if results:
+                cancel.set()
+                if future is hedge:
+                    HEDGE_BUDGET.won()
+                return results
+    return []
+
+
+def fetch_search_results(engine: Dict, query: str, use_cache: bool = True,
+                         hedge: bool = HEDGE_ENABLED) -> List[Dict[str, str]]:
+    if use_cache:
+        cached = _cached_results(engine, query)
+        if cached is not None:
+            return cached
+
+    results = _fetch_hedged(engine, query) if hedge else _fetch_engine(engine, query)
+    # empty answers are usually a dead engine or circuit, not a real "no hits"
+    if results:
+        SEARCH_CACHE.store(engine["name"], query, results)
+    return results
+
+
+# (engine, results, error) — fired once per engine as it finishes
+EngineCallback = Callable[[Dict, List[Dict[str, str]], Optional[Exception]], None]
+
+
+def collect_search_results(
+    query: str,
+    max_workers: int = 10,
+    on_engine_done: Optional[EngineCallback] = None,
+) -> List[Dict[str, str]]:
     raw: List[Dict[str, str]] = []
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
@@ -200,19 +320,31 @@ def get_search_results(query: str, max_workers: int = 10) -> List[Dict[str, str]
             for engine in SEARCH_ENGINES
         }
         for future in as_completed(futures):
-            engine = futures[future]
+            engine  = futures[future]
+            results: List[Dict[str, str]] = []
+            error: Optional[Exception] = None
             try:
-                raw.extend(future.result())
+                results = future.result()
+                raw.extend(results)
             except Exception as e:
+                error = e
                 print(f"[{engine['name']}] thread error: {e}")
 
+            # runs in the caller's thread, so UI code can update widgets here
+            if on_engine_done:
+                on_engine_done(engine, results, error)
+
+    return raw
+
+
+def rank_search_results(query: str, raw: List[Dict[str, str]]) -> List[Dict[str, str]]:
     seen: Set[str] = set()
     unique: List[Dict[str, str]] = []
     for item in raw:
         lnk = item["link"]
         if lnk not in seen:
             seen.add(lnk)
-            unique.append(item)
+            unique.append(dict(item))
 
     if not unique:
         print(f"\n[ROTTWEILER] Raw: {len(raw)} → Unique: 0")
@@ -232,6 +364,195 @@ def get_search_results(query: str, max_workers: int = 10) -> List[Dict[str, str]
     return unique
 
 
+def get_search_results(
+    query: str,
+    max_workers: int = 10,
+    on_engine_done: Optional[EngineCallback] = None,
+) -> List[Dict[str, str]]:
+    raw = collect_search_results(query, max_workers=max_workers, on_engine_done=on_engine_done)
+    return rank_search_results(query, raw)
+
+
+# ASYNC SEARCH PATH
+
+def _make_async_client(max_connections: int, circuit: str = "") -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    # one SOCKS transport per engine host, each with its own credentials and so its own circuit
+    mounts = {
+        f"all://{isolation_key(engine['url'])}": httpx.AsyncHTTPTransport(
+            proxy=proxy_url(engine["name"] + circuit, scheme=TOR_SOCKS_SCHEME), retries=1, limits=limits,
+        )
+        for engine in SEARCH_ENGINES
+    }
+    # redirects off an engine's host land on a shared fallback
+    transport = httpx.AsyncHTTPTransport(proxy=proxy_url("search" + circuit, scheme=TOR_SOCKS_SCHEME), retries=1, limits=limits)
+    return httpx.AsyncClient(
+        transport=transport,
+        mounts=mounts,
+        timeout=httpx.Timeout(ENGINE_TIMEOUT, connect=20),
+        follow_redirects=True,
+    )
+
+
+async def _async_fetch_once(
+    client: httpx.AsyncClient,
+    name: str,
+    endpoint: str,
+    deadline: float,
+    started: Optional[float] = None,
+) -> List[Dict[str, str]]:
+    # a hedge reports latency from when the primary went out, which is what the caller waited
+    start = time.monotonic() if started is None else started
+    try:
+        response = await asyncio.wait_for(client.get(endpoint, headers=get_headers()), timeout=deadline)
+        if response.status_code != 200:
+            print(f"[{name}] Non-200: {response.status_code}")
+            ENGINE_HEALTH.record(name, time.monotonic() - start, False, error=f"HTTP {response.status_code}")
+            return []
+
+        # parse off the event loop so other engines keep streaming
+        results = await asyncio.to_thread(_parse_engine_results, name, response.text)
+        ENGINE_HEALTH.record(name, time.monotonic() - start, True, len(results))
+        return results
+
+    except asyncio.TimeoutError:
+        print(f"[{name}] deadline {deadline:.0f}s exceeded — cancelled")
+        ENGINE_HEALTH.record(name, time.monotonic() - start, False, error="deadline exceeded", timed_out=True)
+        return []
+    except httpx.ConnectError:
+        # the local SOCKS port didn't answer — Tor itself is down, which says nothing about the engine
+        print(f"[{name}] Tor unreachable — skipping")
+        return []
+    except httpx.ProxyError as e:
+        # Tor answered the SOCKS request with a failure for this engine
+        err = str(e)
+        print(f"[{name}] proxy error: {err[:100]}")
+        ENGINE_HEALTH.record(name, time.monotonic() - start, False, error=err)
+        return []
+    except Exception as e:
+        print(f"[{name}] error: {str(e)[:100]}")
+        ENGINE_HEALTH.record(name, time.monotonic() - start, False, error=str(e))
+        return []
+
+
+async def _async_fetch_hedged(
+    client: httpx.AsyncClient,
+    hedge_client: httpx.AsyncClient,
+    name: str,
+    endpoint: str,
+    deadline: float,
+) -> List[Dict[str, str]]:
+    HEDGE_BUDGET.earn()
+    delay   = ENGINE_HEALTH.hedge_delay(name)
+    started = time.monotonic()
+    primary = asyncio.ensure_future(_async_fetch_once(client, name, endpoint, deadline, started))
+    running = {primary}
+    try:
+        if delay is not None and delay < deadline:
+            done, _ = await asyncio.wait(running, timeout=delay)
+            if not done and HEDGE_BUDGET.spend():
+                print(f"[{name}] no answer after p50 {delay:.1f}s — hedging on a fresh circuit")
+                hedge = asyncio.ensure_future(_async_fetch_once(hedge_client, name, endpoint, deadline - delay, started))
+                running.add(hedge)
+                while running:
+                    done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.result():
+                            if task is hedge:
+                                HEDGE_BUDGET.won()
+                            return task.result()
+                return []
+        return await primary
+    finally:
+        # the loser is cancelled mid-request, so it never records a bogus failure
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+
+async def _async_fetch_search_results(
+    client: httpx.AsyncClient,
+    engine: Dict,
+    query: str,
+    deadline: float,
+    hedge_client: Optional[httpx.AsyncClient] = None,
+) -> List[Dict[str, str]]:
+    name     = engine["name"]
+    endpoint = engine["url"].format(query=urllib.parse.quote_plus(query))
+
+    cached = _cached_results(engine, query)
+    if cached is not None:
+        return cached
+
+    if not ENGINE_HEALTH.allow(name):
+        raise CircuitOpenError(f"{name} circuit open")
+
+    deadline = min(deadline, ENGINE_HEALTH.timeout_for(name))
+    if hedge_client is not None:
+        results = await _async_fetch_hedged(client, hedge_client, name, endpoint, deadline)
+    else:
+        results = await _async_fetch_once(client, name, endpoint, deadline)
+    if results:
+        SEARCH_CACHE.store(name, query, results)
+    return results
+
+
+async def async_collect_search_results(
+    query: str,
+    deadline: float = ENGINE_TIMEOUT,
+    total_deadline: Optional[float] = None,
+    max_connections: int = 20,
+    on_engine_done: Optional[EngineCallback] = None,
+    hedge: bool = HEDGE_ENABLED,
+) -> List[Dict[str, str]]:
+    raw: List[Dict[str, str]] = []
+
+    # hedges go out on a second set of per-engine credentials, i.e. different circuits
+    hedge_client = _make_async_client(max_connections, circuit="#hedge") if hedge else None
+    async with _make_async_client(max_connections) as client:
+
+        async def run(engine: Dict):
+            try:
+                return engine, await _async_fetch_search_results(client, engine, query, deadline, hedge_client), None
+            except Exception as e:
+                return engine, [], e
+
+        tasks = [asyncio.ensure_future(run(engine)) for engine in SEARCH_ENGINES]
+        try:
+            for next_done in asyncio.as_completed(tasks, timeout=total_deadline):
+                engine, results, error = await next_done
+                if error is not None:
+                    print(f"[{engine['name']}] task error: {error}")
+                raw.extend(results)
+                if on_engine_done:
+                    on_engine_done(engine, results, error)
+        except asyncio.TimeoutError:
+            print(f"[ROTTWEILER] search deadline {total_deadline}s reached — cancelling stragglers")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if hedge_client is not None:
+                await hedge_client.aclose()
+
+    return raw
+
+
+async def async_get_search_results(
+    query: str,
+    deadline: float = ENGINE_TIMEOUT,
+    total_deadline: Optional[float] = None,
+    on_engine_done: Optional[EngineCallback] = None,
+) -> List[Dict[str, str]]:
+    raw = await async_collect_search_results(
+        query,
+        deadline=deadline,
+        total_deadline=total_deadline,
+        on_engine_done=on_engine_done,
+    )
+    return rank_search_results(query, raw)
+
+
 def run_search_agents(query: str, max_results: int = 50) -> List[str]:
     results = get_search_results(query, max_workers=10)
     return [r["link"] for r in results][:max_results]
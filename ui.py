@@ -4,6 +4,12 @@ import html as html_module
 import base64
 import os
 import re
+import time
+from typing import Callable, Iterable, Union
+
+from timeline import TIMELINE_CSS
+
+STREAM_REFRESH = 0.1   # seconds between redraws while an LLM answer streams in
 
 _TAG_RE    = re.compile(r"<[^>]+>")
 _MULTI_SPC = re.compile(r"\s{2,}")
@@ -339,7 +345,7 @@ html, body,
 </style>
 """, unsafe_allow_html=True)
 
-def render_sidebar(LOGO_B64, SEARCH_ENGINES, last_query, requested_count, active_count, offline_count, selected_model, claude_ai, MODEL_DISPLAY_NAMES):
+def render_sidebar(LOGO_B64, SEARCH_ENGINES, last_query, requested_count, active_count, offline_count, selected_model, claude_ai, MODEL_DISPLAY_NAMES, engine_health=None):
     if LOGO_B64:
         st.markdown(f"""
         <div style="display:flex;align-items:center;gap:12px;padding:16px 0 20px;">
@@ -399,9 +405,25 @@ def render_sidebar(LOGO_B64, SEARCH_ENGINES, last_query, requested_count, active
         return "clear"
 
     st.markdown('<div class="sidebar-label">Search Engines</div>', unsafe_allow_html=True)
+    engine_health = engine_health or {}
     for engine in SEARCH_ENGINES:
         safe_engine_name = clean(engine["name"], 40)
-        st.markdown(f'<div class="sidebar-engine">• {safe_engine_name}</div>', unsafe_allow_html=True)
+        health = engine_health.get(engine["name"])
+        if not health or not health["samples"]:
+            st.markdown(f'<div class="sidebar-engine">• {safe_engine_name}</div>', unsafe_allow_html=True)
+            continue
+
+        dot_color = {"closed": "#00c97a", "half_open": "#f0a500"}.get(health["state"], "#e63946")
+        detail = (
+            "CIRCUIT OPEN" if health["state"] == "open"
+            else f'p95 {health["p95"]:.1f}s · {health["error_rate"] * 100:.0f}% err · {health["avg_yield"]:.0f} links'
+        )
+        st.markdown(
+            f'<div class="sidebar-engine" title="{clean(health["last_error"], 80)}">'
+            f'<span style="color:{dot_color};">●</span> {safe_engine_name}'
+            f'<span style="float:right;color:#5a5e6a;font-size:9px;">{detail}</span></div>',
+            unsafe_allow_html=True
+        )
     
     st.markdown('<div style="height:1px;background:#2a1a1e;margin:18px 0 12px;"></div>', unsafe_allow_html=True)
     st.markdown("""
@@ -553,6 +575,8 @@ def render_hunt_results(result, sites, offline_sites, uptime_bar_html):
     )
 
     use_timeline = st.checkbox("Timeline bars", value=False, key="hunt_timeline")
+    if use_timeline:
+        st.markdown(TIMELINE_CSS, unsafe_allow_html=True)
 
     filtered = [s for s in sites if s["status"] == "online"]
     filtered = sorted(filtered, key=lambda x: x["url"])
@@ -755,23 +779,46 @@ def render_analysis_tab_content(sites):
     
     return generate_brief, custom_prompt, run_analysis
 
-def render_analysis_result(brief):
+def render_streaming(chunks: Iterable[str], render: Callable[[str], str], placeholder=None) -> str:
+    """Redraws placeholder with render(text so far) as chunks arrive; returns the full text."""
+    placeholder = placeholder if placeholder is not None else st.empty()
+    text = ""
+    drawn = 0.0
+    for chunk in chunks:
+        text += chunk
+        if time.monotonic() - drawn >= STREAM_REFRESH:
+            placeholder.markdown(render(text), unsafe_allow_html=True)
+            drawn = time.monotonic()
+    placeholder.markdown(render(text), unsafe_allow_html=True)
+    return text
+
+def analysis_box_html(brief: str) -> str:
     safe_brief = brief.replace("\n", "<br>") if brief else "No summary available."
-    st.markdown(
-        f'<div class="terminal-box">{safe_brief}'
-        f'<span class="blink">▌</span></div>',
-        unsafe_allow_html=True
-    )
+    return f'<div class="terminal-box">{safe_brief}<span class="blink">▌</span></div>'
+
+def brief_preview_html(text: str, max_lines: int = 10) -> str:
+    """Tail of a streaming brief, for the hunt terminal."""
+    lines = [html_module.escape(line) for line in text.splitlines()[-max_lines:]]
+    return '<span style="color:#8a9ab0;">' + "<br>".join(lines) + "</span>"
 
-def render_custom_analysis_result(result_text):
+def render_analysis_result(brief: Union[str, Iterable[str], None]) -> str:
+    """Renders a finished brief, or a chunk stream progressively. Returns the text."""
+    if brief is None or isinstance(brief, str):
+        st.markdown(analysis_box_html(brief), unsafe_allow_html=True)
+        return brief or ""
+    return render_streaming(brief, analysis_box_html)
+
+def custom_analysis_box_html(result_text: str) -> str:
     safe_result = result_text.replace("\n", "<br>") if result_text else "No analysis available."
-    st.markdown(
-        f'<div class="terminal-box">{safe_result}'
-        f'<span class="blink">▌</span></div>',
-        unsafe_allow_html=True
-    )
+    return f'<div class="terminal-box">{safe_result}<span class="blink">▌</span></div>'
+
+def render_custom_analysis_result(result_text: Union[str, Iterable[str], None]) -> str:
+    if result_text is None or isinstance(result_text, str):
+        st.markdown(custom_analysis_box_html(result_text), unsafe_allow_html=True)
+        return result_text or ""
+    return render_streaming(result_text, custom_analysis_box_html)
 
-def render_settings_tab():
+def render_settings_tab(pool_stats=None, cache_stats=None, port_stats=None, tor_metrics=None):
     st.markdown('<div class="sec-header">PROVIDER CONFIGURATION</div>', unsafe_allow_html=True)
 
     for pname, env in [
@@ -806,6 +853,47 @@ def render_settings_tab():
     </div>
     """, unsafe_allow_html=True)
 
+    if pool_stats:
+        rows = "<br>".join(
+            f"{clean(p['pool'], 10).upper():<8}: {p['requests']:>5} req · {p['connections']:>4} conn · "
+            f"{p['reuse_ratio'] * 100:>3.0f}% reused"
+            for p in pool_stats
+        )
+        if port_stats and len(port_stats) > 1:
+            rows += "<br>" + " · ".join(
+                f"{p['port']}: {p['sent']} sent / {p['inflight']} live" for p in port_stats
+            )
+        st.markdown(
+            f'<div class="terminal-box" style="max-height:130px;">CONNECTION POOLS<br>'
+            f'──────────────────────────────<br>{rows}</div>',
+            unsafe_allow_html=True
+        )
+
+    if tor_metrics:
+        t = tor_metrics
+        st.markdown(
+            f'<div class="terminal-box" style="max-height:150px;">TOR CONTROL<br>'
+            f'──────────────────────────────<br>'
+            f'BOOTSTRAP : {t["bootstrap"]}% {clean(t["summary"], 40)}<br>'
+            f'CIRCUITS  : {t["circuits_built"]}/{t["circuits"]} built · {t["build_failed"]} failed<br>'
+            f'BUILD     : p50 {t["build_p50"]:.1f}s · p95 {t["build_p95"]:.1f}s ({t["build_samples"]} samples)<br>'
+            f'STREAMS   : {t["streams"]} open<br>'
+            f'SCRAPES   : {t["scrape_fail"] * 100:.0f}% failing · {t["newnym"]} NEWNYM sent</div>',
+            unsafe_allow_html=True
+        )
+
+    if cache_stats:
+        rows = "<br>".join(
+            f"{clean(name, 10).upper():<8}: {c.get('hits', 0) + c.get('stale_hits', 0) + c.get('revalidated', 0):>5} hit · "
+            f"{c.get('misses', 0):>5} miss · {c.get('entries', 0):>5} entries"
+            for name, c in cache_stats.items()
+        )
+        st.markdown(
+            f'<div class="terminal-box" style="max-height:130px;">CACHES<br>'
+            f'──────────────────────────────<br>{rows}</div>',
+            unsafe_allow_html=True
+        )
+
     st.markdown('<div class="sec-header">ABOUT</div>', unsafe_allow_html=True)
     st.markdown("""
     <div style="font-family:'Inter',system-ui,sans-serif;font-size:14px;color:#5a5e6a;line-height:1.8;">